@@ -4,11 +4,197 @@ import asyncio
 from typing import List, Dict, Optional, Any
 import openai
 import anthropic
+import httpx
 from datetime import datetime
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.cluster import KMeans
 import re
+import contextlib
+import copy
+import time
+import hashlib
+from collections import Counter, OrderedDict, deque
+from timelapse_codec import TimeLapseColumns, time_lapse_columns
+
+# Everything str.split() treats as whitespace. Words are counted as runs of anything else, both
+# in Python and in MongoDB aggregations, whose \S only excludes ASCII whitespace
+WHITESPACE = (
+    "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680"
+    "\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a"
+    "\u2028\u2029\u202f\u205f\u3000"
+)
+WORD_PATTERN = "[^" + WHITESPACE + "]+"
+
+class StoryCache:
+    """Generated stories keyed on normalized prompt, age band and interests.
+    
+    In-process LRU with a TTL, optionally backed by a MongoDB collection so entries
+    survive restarts and are shared between workers.
+    """
+    
+    STOP_WORDS = {"a", "an", "the", "about", "story", "please"}
+    AGE_BANDS = [(5, "3-5"), (8, "6-8"), (12, "9-12")]
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.collection = None
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+    
+    def make_key(self, prompt: str, child_age: Optional[int], interests: List[str] = None) -> str:
+        words = [word for word in re.findall(r"[a-z0-9'-]+", prompt.lower()) if word not in self.STOP_WORDS]
+        age_band = "unknown"
+        if child_age is not None:
+            age_band = next((band for limit, band in self.AGE_BANDS if child_age <= limit), "13+")
+        raw = f"{' '.join(words)}|{age_band}|{','.join(sorted(interests or []))}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry and entry[0] >= time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+        if entry:
+            del self._entries[key]
+        
+        if self.collection is not None:
+            doc = await self.collection.find_one({"_id": key})
+            # The TTL monitor only runs once a minute, so check the age here as well
+            if doc and (datetime.utcnow() - doc["created_at"]).total_seconds() < self.ttl_seconds:
+                self._remember(key, doc["story"])
+                self.persistent_hits += 1
+                return copy.deepcopy(doc["story"])
+        
+        self.misses += 1
+        return None
+    
+    async def set(self, key: str, story: Dict[str, Any], persist: bool = True):
+        self._remember(key, story)
+        if persist and self.collection is not None:
+            await self.collection.replace_one(
+                {"_id": key},
+                {"story": story, "created_at": datetime.utcnow()},
+                upsert=True
+            )
+    
+    def _remember(self, key: str, story: Dict[str, Any]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(story))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses
+        }
+
+
+class ProviderHealth:
+    """Recent latencies and a circuit breaker for one story provider"""
+    
+    def __init__(self, failure_threshold: int, cooldown_seconds: float, window: int = 50, min_samples: int = 10):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.successes = 0
+        self.failures = 0
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+    
+    def acquire(self) -> Optional[str]:
+        """Admit a request: "closed" normally, "trial" for the one probe a half-open circuit
+        lets through at a time, None when refused. Pass the ticket back when the call ends."""
+        state = self.state
+        if state == "closed":
+            return "closed"
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return "trial"
+        return None
+    
+    def release(self, ticket: Optional[str]):
+        """End a call without an outcome, e.g. one cancelled after losing a hedged race"""
+        if ticket == "trial":
+            self.trial_in_flight = False
+    
+    def record_latency(self, latency: float):
+        self.latencies.append(latency)
+    
+    def record_success(self, latency: float, ticket: Optional[str] = None):
+        self.record_latency(latency)
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.release(ticket)
+    
+    def record_failure(self, ticket: Optional[str] = None):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.release(ticket)
+    
+    def percentile(self, percent: float) -> Optional[float]:
+        if len(self.latencies) < self.min_samples:
+            return None
+        return float(np.percentile(self.latencies, percent))
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "successes": self.successes,
+            "failures": self.failures,
+            "p50_seconds": self.percentile(50),
+            "p95_seconds": self.percentile(95)
+        }
+
+
+class StoryBroadcast:
+    """Pages of one streamed generation, replayed to every request coalesced onto it"""
+    
+    def __init__(self):
+        self.pages = []
+        self._updated = asyncio.Event()
+    
+    def publish(self, pages: List[Dict]):
+        self.pages.extend(pages)
+        self._updated.set()
+        self._updated = asyncio.Event()
+    
+    async def follow(self, generation: asyncio.Future):
+        """Yield every page published so far, then each new one until the generation ends"""
+        sent = 0
+        while True:
+            while sent < len(self.pages):
+                sent += 1
+                yield self.pages[sent - 1]
+            if generation.done():
+                return
+            updated = asyncio.ensure_future(self._updated.wait())
+            try:
+                # Waiting on the generation doesn't cancel it if this follower goes away
+                await asyncio.wait({generation, updated}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                updated.cancel()
+
 
 class AIStoryGenerator:
     """AI-powered story generation service"""
@@ -16,41 +202,386 @@ class AIStoryGenerator:
     def __init__(self):
         self.openai_client = None
         self.anthropic_client = None
+        self.http_client = None
+        self.openai_timeout = float(os.getenv('OPENAI_TIMEOUT_SECONDS', '30'))
+        self.anthropic_timeout = float(os.getenv('ANTHROPIC_TIMEOUT_SECONDS', '30'))
+        # Cap in-flight calls per provider; extra generations wait here instead of piling onto the API
+        self.openai_limit = asyncio.Semaphore(int(os.getenv('OPENAI_MAX_CONCURRENCY', '8')))
+        self.anthropic_limit = asyncio.Semaphore(int(os.getenv('ANTHROPIC_MAX_CONCURRENCY', '8')))
+        self.cache = StoryCache(
+            int(os.getenv('STORY_CACHE_SIZE', '512')),
+            float(os.getenv('STORY_CACHE_TTL_SECONDS', '86400'))
+        )
+        # Single-flight: one provider call per cache key, shared by every concurrent request
+        self._in_flight = {}
+        # Pages published so far by streamed generations in _in_flight, by the same key
+        self._broadcasts = {}
+        self.coalescing_stats = {"leader_calls": 0, "coalesced_calls": 0}
+        # Failover: providers are tried in order, skipping any whose circuit is open
+        self.generation_deadline = float(os.getenv('STORY_GENERATION_DEADLINE_SECONDS', '45'))
+        self.hedging_enabled = os.getenv('STORY_HEDGING_ENABLED', 'false').lower() == 'true'
+        self.default_hedge_delay = float(os.getenv('STORY_HEDGE_DEFAULT_DELAY_SECONDS', '5'))
+        self.circuit_failure_threshold = int(os.getenv('STORY_CIRCUIT_FAILURE_THRESHOLD', '3'))
+        self.circuit_cooldown = float(os.getenv('STORY_CIRCUIT_COOLDOWN_SECONDS', '30'))
+        self.providers = OrderedDict()
+        self.stream_providers = OrderedDict()
+        self.provider_timeouts = {}
+        self.provider_limits = {}
+        self.provider_health = {}
         self.setup_clients()
         
     def setup_clients(self):
-        """Initialize AI clients with API keys"""
+        """Initialize async AI clients sharing one pooled keep-alive HTTP transport"""
         openai_key = os.getenv('OPENAI_API_KEY')
         anthropic_key = os.getenv('ANTHROPIC_API_KEY')
+        has_openai = openai_key and openai_key != 'your-openai-api-key-placeholder'
+        has_anthropic = anthropic_key and anthropic_key != 'your-anthropic-api-key-placeholder'
+        
+        if has_openai or has_anthropic:
+            self.http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv('AI_HTTP_MAX_CONNECTIONS', '32')),
+                    max_keepalive_connections=int(os.getenv('AI_HTTP_MAX_KEEPALIVE', '16')),
+                    keepalive_expiry=float(os.getenv('AI_HTTP_KEEPALIVE_SECONDS', '60'))
+                )
+            )
         
-        if openai_key and openai_key != 'your-openai-api-key-placeholder':
-            self.openai_client = openai.OpenAI(api_key=openai_key)
+        if has_openai:
+            self.openai_client = openai.AsyncOpenAI(
+                api_key=openai_key, http_client=self.http_client, timeout=self.openai_timeout
+            )
             
-        if anthropic_key and anthropic_key != 'your-anthropic-api-key-placeholder':
-            self.anthropic_client = anthropic.Anthropic(api_key=anthropic_key)
+        if has_anthropic:
+            self.anthropic_client = anthropic.AsyncAnthropic(
+                api_key=anthropic_key, http_client=self.http_client, timeout=self.anthropic_timeout
+            )
+        
+        if self.openai_client:
+            self.register_provider("openai", self._generate_with_openai, self._stream_with_openai, self.openai_timeout, self.openai_limit)
+        if self.anthropic_client:
+            self.register_provider("anthropic", self._generate_with_anthropic, self._stream_with_anthropic, self.anthropic_timeout, self.anthropic_limit)
+    
+    def register_provider(self, name: str, generate, stream=None, timeout: float = 30.0,
+                          limit: Optional[asyncio.Semaphore] = None):
+        """Add a story provider; generate(system_prompt, user_prompt) returns the story dict.
+        
+        limit caps in-flight calls; time spent waiting on it is not charged to the provider.
+        """
+        self.providers[name] = generate
+        if stream:
+            self.stream_providers[name] = stream
+        self.provider_timeouts[name] = timeout
+        self.provider_limits[name] = limit
+        self.provider_health[name] = ProviderHealth(self.circuit_failure_threshold, self.circuit_cooldown)
+    
+    def provider_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: health.stats() for name, health in self.provider_health.items()}
+    
+    async def aclose(self):
+        """Close the shared HTTP transport"""
+        if self.http_client:
+            await self.http_client.aclose()
     
     async def generate_story(self, prompt: str, child_age: int = 7, interests: List[str] = None) -> Dict[str, Any]:
         """Generate a child-friendly story based on prompt"""
+        cache_key = self.cache.make_key(prompt, child_age, interests)
+        cached = await self.cache.get(cache_key)
+        if cached:
+            cached["generated_with"] = f"{cached.get('generated_with', 'ai')}+cache"
+            return cached
+        
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight:
+            self.coalescing_stats["coalesced_calls"] += 1
+        else:
+            self.coalescing_stats["leader_calls"] += 1
+            in_flight = asyncio.ensure_future(self._generate_uncached(prompt, child_age, interests, cache_key))
+            self._in_flight[cache_key] = in_flight
+            in_flight.add_done_callback(lambda _: self._in_flight.pop(cache_key, None))
         
+        # Shielded so a disconnecting client doesn't cancel the call other requests are waiting on
+        story = await asyncio.shield(in_flight)
+        return copy.deepcopy(story)
+    
+    async def _generate_uncached(self, prompt: str, child_age: int, interests: List[str], cache_key: str) -> Dict[str, Any]:
+        """Generate a story with the configured provider, falling back to templates"""
         # If no API keys available, use template-based generation
-        if not self.openai_client and not self.anthropic_client:
-            return self._generate_template_story(prompt, child_age, interests)
+        if not self.providers:
+            story = self._generate_template_story(prompt, child_age, interests)
+            # Templates are cheap to rebuild, so they are only memoized in process
+            await self.cache.set(cache_key, story, persist=False)
+            return story
         
         try:
             # Prepare the story generation prompt
             system_prompt = self._create_system_prompt(child_age, interests)
             user_prompt = self._create_user_prompt(prompt)
             
-            # Try OpenAI first, then Anthropic
-            if self.openai_client:
-                return await self._generate_with_openai(system_prompt, user_prompt)
-            elif self.anthropic_client:
-                return await self._generate_with_anthropic(system_prompt, user_prompt)
+            story = await self._generate_with_providers(system_prompt, user_prompt)
+            story.setdefault("generated_with", "ai")
+            await self.cache.set(cache_key, story)
+            return story
                 
         except Exception as e:
+            # Fallback stories are not cached so the next request retries the provider
             print(f"AI generation failed: {e}")
             return self._generate_template_story(prompt, child_age, interests)
     
+    async def _generate_with_providers(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """Race providers in order: fail over on errors, optionally hedge after the p95 delay"""
+        candidates = list(self.provider_health)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.generation_deadline
+        pending = {}
+        launched = 0
+        
+        def launch() -> bool:
+            """Start the next provider whose circuit admits a request"""
+            nonlocal launched
+            while launched < len(candidates):
+                name = candidates[launched]
+                launched += 1
+                ticket = self.provider_health[name].acquire()
+                if ticket:
+                    task = asyncio.ensure_future(self._call_provider(name, ticket, system_prompt, user_prompt))
+                    pending[task] = name
+                    return True
+            return False
+        
+        if not launch():
+            raise RuntimeError("All story providers are unavailable")
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError("Story generation deadline exceeded")
+                
+                wait_for = remaining
+                can_hedge = self.hedging_enabled and launched < len(candidates)
+                if can_hedge:
+                    primary = self.provider_health[candidates[launched - 1]]
+                    wait_for = min(remaining, primary.percentile(95) or self.default_hedge_delay)
+                
+                done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if can_hedge:
+                        launch()
+                    continue
+                
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        story = task.result()
+                        story.setdefault("provider", name)
+                        return story
+                    print(f"Story provider {name} failed: {task.exception()}")
+                
+                # Fail over once nothing else is still running
+                if not pending and launched < len(candidates):
+                    launch()
+            
+            raise RuntimeError("All story providers failed")
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _call_provider(self, name: str, ticket: str, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """Call one provider with its timeout, recording latency and failures"""
+        health = self.provider_health[name]
+        started = None
+        try:
+            # Waiting for a local slot is not the provider's latency, so timing starts once in
+            async with self.provider_limits.get(name) or contextlib.nullcontext():
+                started = time.monotonic()
+                story = await asyncio.wait_for(
+                    self.providers[name](system_prompt, user_prompt),
+                    timeout=self.provider_timeouts[name]
+                )
+        except asyncio.CancelledError:
+            # Lost a hedged race; that says nothing about the provider's health, but it took
+            # at least this long, and leaving it out would make the p95 hedge delay too short
+            if started is not None:
+                health.record_latency(time.monotonic() - started)
+            health.release(ticket)
+            raise
+        except Exception:
+            health.record_failure(ticket)
+            raise
+        health.record_success(time.monotonic() - started, ticket)
+        return story
+    
+    async def stream_story(self, prompt: str, child_age: int = 7, interests: List[str] = None):
+        """Yield ("page", page) as each page is ready, then ("story", story) with the full result"""
+        cache_key = self.cache.make_key(prompt, child_age, interests)
+        cached = await self.cache.get(cache_key)
+        if cached:
+            cached["generated_with"] = f"{cached.get('generated_with', 'ai')}+cache"
+            for page in cached["pages"]:
+                yield "page", page
+            yield "story", cached
+            return
+        
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight:
+            self.coalescing_stats["coalesced_calls"] += 1
+        else:
+            self.coalescing_stats["leader_calls"] += 1
+            if self.stream_providers:
+                self._broadcasts[cache_key] = StoryBroadcast()
+                in_flight = asyncio.ensure_future(
+                    self._stream_uncached(prompt, child_age, interests, cache_key, self._broadcasts[cache_key])
+                )
+            else:
+                in_flight = asyncio.ensure_future(self._generate_uncached(prompt, child_age, interests, cache_key))
+            self._in_flight[cache_key] = in_flight
+            in_flight.add_done_callback(lambda _: self._forget_in_flight(cache_key))
+        
+        # Pages are forwarded as the leader publishes them; a non-streamed leader has none until it ends
+        pages_sent = 0
+        broadcast = self._broadcasts.get(cache_key)
+        if broadcast:
+            async for page in broadcast.follow(in_flight):
+                pages_sent += 1
+                yield "page", page
+        
+        # Shielded as in generate_story
+        story = copy.deepcopy(await asyncio.shield(in_flight))
+        for page in story["pages"][pages_sent:]:
+            yield "page", page
+        yield "story", story
+    
+    def _forget_in_flight(self, cache_key: str):
+        self._in_flight.pop(cache_key, None)
+        self._broadcasts.pop(cache_key, None)
+    
+    async def _stream_uncached(self, prompt: str, child_age: int, interests: List[str], cache_key: str,
+                               broadcast: "StoryBroadcast") -> Dict[str, Any]:
+        """Stream a story, publishing each page to broadcast as it completes.
+        
+        Providers are tried in order within the generation deadline, skipping any whose circuit
+        is open; only when all of them fail does the story finish with template pages.
+        """
+        system_prompt = self._create_system_prompt(child_age, interests)
+        user_prompt = self._create_user_prompt(prompt)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.generation_deadline
+        for name in self.stream_providers:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                print("AI streaming failed: story generation deadline exceeded")
+                break
+            ticket = self.provider_health[name].acquire()
+            if not ticket:
+                continue
+            
+            pages_before = len(broadcast.pages)
+            try:
+                story = await asyncio.wait_for(
+                    self._stream_provider(name, ticket, system_prompt, user_prompt, broadcast),
+                    timeout=remaining
+                )
+            except Exception as e:
+                print(f"Story provider {name} failed while streaming: {str(e) or type(e).__name__}")
+                continue
+            
+            story.setdefault("generated_with", "ai")
+            story.setdefault("provider", name)
+            # Pages already sent can't be taken back, so a provider taking over only adds the rest
+            story["pages"] = broadcast.pages + story.get("pages", [])[len(broadcast.pages):]
+            if not pages_before:
+                await self.cache.set(cache_key, story)
+            return story
+        
+        # Keep the pages the children have already seen and finish with template pages
+        story = self._generate_template_story(prompt, child_age, interests)
+        story["pages"] = broadcast.pages + story["pages"][len(broadcast.pages):]
+        return story
+    
+    async def _stream_provider(self, name: str, ticket: str, system_prompt: str, user_prompt: str,
+                               broadcast: "StoryBroadcast") -> Dict[str, Any]:
+        """Stream one provider's story within its timeout, recording latency and failures"""
+        health = self.provider_health[name]
+        content = ""
+        
+        async def read():
+            nonlocal content
+            async with contextlib.aclosing(self.stream_providers[name](system_prompt, user_prompt)) as stream:
+                async for chunk in stream:
+                    content += chunk
+                    # Publish each page past those already sent as soon as its JSON object is complete
+                    pages = self._extract_complete_pages(content)
+                    if len(pages) > len(broadcast.pages):
+                        broadcast.publish(pages[len(broadcast.pages):])
+        
+        try:
+            # As in _call_provider, waiting for a local slot is not the provider's latency
+            async with self.provider_limits.get(name) or contextlib.nullcontext():
+                started = time.monotonic()
+                await asyncio.wait_for(read(), timeout=self.provider_timeouts[name])
+        except asyncio.CancelledError:
+            # Out of generation time, or shutting down; a half-open trial must not stay claimed
+            health.release(ticket)
+            raise
+        except Exception:
+            health.record_failure(ticket)
+            raise
+        health.record_success(time.monotonic() - started, ticket)
+        
+        try:
+            return json.loads(content)
+        except:
+            return self._parse_story_response(content)
+    
+    async def _stream_with_openai(self, system_prompt: str, user_prompt: str):
+        """Stream story text from OpenAI"""
+        stream = await self.openai_client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=1000,
+            temperature=0.8,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    async def _stream_with_anthropic(self, system_prompt: str, user_prompt: str):
+        """Stream story text from Anthropic"""
+        stream = await self.anthropic_client.messages.create(
+            model="claude-3-haiku-20240307",
+            max_tokens=1000,
+            system=system_prompt,
+            messages=[{"role": "user", "content": user_prompt}],
+            stream=True
+        )
+        async for event in stream:
+            if event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                yield event.delta.text
+    
+    def _extract_complete_pages(self, content: str) -> List[Dict]:
+        """Pages whose JSON objects are complete in a partial story response"""
+        match = re.search(r'"pages"\s*:\s*\[', content)
+        if not match:
+            return []
+        
+        decoder = json.JSONDecoder()
+        pages = []
+        position = match.end()
+        while True:
+            while position < len(content) and content[position] in " \t\r\n,":
+                position += 1
+            if position >= len(content) or content[position] != "{":
+                break
+            try:
+                page, position = decoder.raw_decode(content, position)
+            except ValueError:
+                break
+            pages.append(page)
+        return pages
+    
     def _create_system_prompt(self, child_age: int, interests: List[str] = None) -> str:
         """Create system prompt for AI story generation"""
         interests_text = ""
@@ -85,8 +616,7 @@ The story should be designed for a child to draw illustrations for each page. Ma
     
     async def _generate_with_openai(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
         """Generate story using OpenAI API"""
-        response = await asyncio.to_thread(
-            self.openai_client.chat.completions.create,
+        response = await self.openai_client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -106,8 +636,7 @@ The story should be designed for a child to draw illustrations for each page. Ma
     
     async def _generate_with_anthropic(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
         """Generate story using Anthropic API"""
-        response = await asyncio.to_thread(
-            self.anthropic_client.messages.create,
+        response = await self.anthropic_client.messages.create(
             model="claude-3-haiku-20240307",
             max_tokens=1000,
             system=system_prompt,
@@ -262,28 +791,7 @@ class InterestAnalyzer:
             "animals", "space", "dinosaurs", "ocean", "magic", "vehicles", 
             "nature", "fantasy", "science", "adventure", "friendship"
         ]
-    
-    def analyze_drawing_patterns(self, drawings: List[Dict]) -> Dict[str, float]:
-        """Analyze drawings to identify interest patterns"""
-        if not drawings:
-            return {}
-        
-        # Extract text from drawing titles and descriptions
-        texts = []
-        for drawing in drawings:
-            text_content = f"{drawing.get('title', '')} {drawing.get('description', '')}"
-            texts.append(text_content)
-        
-        # Simple keyword-based analysis
-        interests = {}
-        for category in self.interest_categories:
-            interests[category] = self._calculate_interest_score(texts, category)
-        
-        return interests
-    
-    def _calculate_interest_score(self, texts: List[str], category: str) -> float:
-        """Calculate interest score for a category"""
-        keywords = {
+        self.interest_keywords = {
             "animals": ["cat", "dog", "bird", "fish", "lion", "tiger", "bear", "elephant"],
             "space": ["space", "astronaut", "planet", "star", "rocket", "galaxy", "moon"],
             "dinosaurs": ["dinosaur", "dino", "t-rex", "triceratops", "fossil", "prehistoric"],
@@ -296,19 +804,146 @@ class InterestAnalyzer:
             "adventure": ["adventure", "journey", "explore", "quest", "treasure"],
             "friendship": ["friend", "together", "help", "share", "team", "group"]
         }
+        self._compile_keyword_matcher()
+    
+    def _compile_keyword_matcher(self):
+        """Build one regex over all keywords so each text is scanned a single time"""
+        keywords = {kw for kws in self.interest_keywords.values() for kw in kws}
+        # Zero-width lookahead finds the longest keyword starting at every position, so
+        # overlapping hits ("planet" and "plane") are all seen like str.count would
+        self._keyword_pattern = re.compile("(?=(" + self._keyword_trie_pattern(keywords) + "))")
+        self._word_pattern = re.compile(WORD_PATTERN)
         
-        category_keywords = keywords.get(category, [])
-        total_matches = 0
-        total_words = 0
+        # Category hits implied by each longest match, including shorter keywords it starts with
+        self._match_categories = {}
+        for longest in keywords:
+            counts = {}
+            for keyword in keywords:
+                if longest.startswith(keyword):
+                    for category in self.interest_categories:
+                        if keyword in self.interest_keywords.get(category, []):
+                            counts[category] = counts.get(category, 0) + 1
+            self._match_categories[longest] = list(counts.items())
         
-        for text in texts:
-            text_lower = text.lower()
-            words = text_lower.split()
-            total_words += len(words)
-            
-            for keyword in category_keywords:
-                total_matches += text_lower.count(keyword)
+        # str.count skips overlapping repeats ("aa" in "aaa") while the lookahead sees every
+        # start, so keywords that can overlap themselves get corrected with str.count
+        self._self_overlapping = [
+            (
+                keyword,
+                [longest for longest in keywords if longest.startswith(keyword)],
+                [category for category in self.interest_categories if keyword in self.interest_keywords.get(category, [])]
+            )
+            for keyword in keywords
+            if any(keyword[:i] == keyword[-i:] for i in range(1, len(keyword)))
+        ]
+    
+    def _keyword_trie_pattern(self, keywords) -> str:
+        """Regex alternation factored as a trie so each position is rejected on one character"""
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = {}
         
+        def build(node):
+            branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ""
+            pattern = branches[0] if len(branches) == 1 and "" not in node else "(?:" + "|".join(branches) + ")"
+            return pattern + ("?" if "" in node else "")
+        
+        return build(trie)
+    
+    def analyze_drawing_patterns(self, drawings: List[Dict]) -> Dict[str, float]:
+        """Analyze drawings to identify interest patterns"""
+        if not drawings:
+            return {}
+        
+        # Extract text from drawing titles and descriptions; no keyword spans a newline,
+        # so the joined text is scanned once with the same counts as per-drawing scans
+        text_content = "\n".join(self.drawing_text(drawing) for drawing in drawings)
+        category_matches, total_words = self.count_text_matches(text_content)
+        
+        return self.scores_from_counts(category_matches, total_words)
+    
+    def drawing_text(self, drawing: Dict) -> str:
+        """Text of a drawing that interest keywords are matched against"""
+        return f"{drawing.get('title', '')} {drawing.get('description', '')}"
+    
+    def keyword_count_pipeline(self, match: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Aggregation pipeline computing count_text_matches totals inside MongoDB.
+
+        Only the summed counts leave the server. Occurrences are counted like str.count,
+        as the number of $split pieces minus one, and words as runs of WORD_PATTERN, the
+        same as count_text_matches. The result is one document with drawing_count, total_words and
+        category_<i> fields in interest_categories order (see counts_from_pipeline).
+        """
+        def field_text(field: str) -> Dict[str, Any]:
+            # Same as drawing_text: a missing field is "" but a null one formats as "None"
+            return {"$cond": [
+                {"$eq": [{"$type": f"${field}"}, "missing"]},
+                "",
+                {"$toString": {"$ifNull": [f"${field}", "None"]}}
+            ]}
+
+        text = {"$toLower": {"$concat": [field_text("title"), " ", field_text("description")]}}
+        counts = {
+            f"category_{i}": {"$add": [0] + [
+                {"$subtract": [{"$size": {"$split": ["$text", keyword]}}, 1]}
+                for keyword in self.interest_keywords.get(category, [])
+            ]}
+            for i, category in enumerate(self.interest_categories)
+        }
+        return [
+            {"$match": match},
+            {"$project": {"_id": 0, "text": text}},
+            {"$project": {"words": {"$size": {"$regexFindAll": {"input": "$text", "regex": WORD_PATTERN}}}, **counts}},
+            {"$group": {
+                "_id": None,
+                "drawing_count": {"$sum": 1},
+                "total_words": {"$sum": "$words"},
+                **{field: {"$sum": f"${field}"} for field in counts}
+            }}
+        ]
+    
+    def counts_from_pipeline(self, result: Optional[Dict[str, Any]]) -> tuple:
+        """(category_matches, total_words, drawing_count) from keyword_count_pipeline output"""
+        if not result:
+            return dict.fromkeys(self.interest_categories, 0), 0, 0
+        category_matches = {
+            category: result.get(f"category_{i}", 0)
+            for i, category in enumerate(self.interest_categories)
+        }
+        return category_matches, result["total_words"], result["drawing_count"]
+    
+    def scores_from_counts(self, category_matches: Dict[str, int], total_words: int) -> Dict[str, float]:
+        """Interest scores from accumulated keyword hits, e.g. a stored interest profile"""
+        return {
+            category: self._calculate_interest_score(category_matches.get(category, 0), total_words)
+            for category in self.interest_categories
+        }
+    
+    def count_text_matches(self, text: str) -> tuple:
+        """Keyword hits per category and the word count of a text"""
+        text_lower = text.lower()
+        category_matches = dict.fromkeys(self.interest_categories, 0)
+        
+        found = Counter(self._keyword_pattern.findall(text_lower))
+        for longest, hits in found.items():
+            for category, weight in self._match_categories[longest]:
+                category_matches[category] += hits * weight
+        
+        for keyword, longest_matches, categories in self._self_overlapping:
+            correction = text_lower.count(keyword) - sum(found[longest] for longest in longest_matches)
+            if correction:
+                for category in categories:
+                    category_matches[category] += correction
+        
+        return category_matches, len(self._word_pattern.findall(text_lower))
+    
+    def _calculate_interest_score(self, total_matches: int, total_words: int) -> float:
+        """Calculate interest score for a category"""
         return min(total_matches / max(total_words, 1) * 100, 100.0)
     
     def get_personalized_recommendations(self, interests: Dict[str, float], current_quests: List[str]) -> List[Dict]:
@@ -370,20 +1005,34 @@ class InterestAnalyzer:
 class DrawingProgressAnalyzer:
     """Analyze drawing progress and provide intelligent assistance"""
     
+    # Bump when the analysis output changes so stored analyses get recomputed
+    VERSION = 3
+    DEFAULT_CANVAS_SIZE = (1000, 700)
+    PAUSE_BUCKETS = [("under_1s", 0), ("1_to_5s", 1), ("5_to_30s", 5), ("over_30s", 30)]
+    
     def __init__(self):
         self.skill_categories = ["line_control", "shape_drawing", "color_usage", "composition", "creativity"]
     
-    def analyze_drawing_progress(self, time_lapse: List[Dict], drawing_duration: int) -> Dict[str, Any]:
-        """Analyze drawing progress from time-lapse data"""
+    def analyze_drawing_progress(self, time_lapse: List[Dict], drawing_duration: int, canvas_size: Optional[tuple] = None) -> Dict[str, Any]:
+        """Analyze drawing progress from time-lapse data (step list or packed columns)"""
         if not time_lapse:
             return {"status": "no_data"}
         
+        # Convert once; every metric below is computed on the same NumPy columns
+        columns = time_lapse_columns(time_lapse)
+        # Pointer moves sampled while drawing feed the stroke metrics; everything else counts actions
+        actions = columns.codes["action"] != self._action_code(columns, "move")
+        action_count = int(actions.sum())
+        tools_used = self._analyze_tools_used(columns, actions)
+        timestamps = columns.timestamps[columns.has_timestamp & (columns.timestamps != 0)]
+        
         analysis = {
-            "total_actions": len(time_lapse),
+            "total_actions": action_count,
             "drawing_duration": drawing_duration,
-            "tools_used": self._analyze_tools_used(time_lapse),
-            "drawing_pace": self._analyze_drawing_pace(time_lapse),
-            "complexity_score": self._calculate_complexity_score(time_lapse),
+            "tools_used": tools_used,
+            "drawing_pace": self._analyze_drawing_pace(action_count, timestamps),
+            "complexity_score": self._calculate_complexity_score(action_count, len(tools_used)),
+            "stroke_metrics": self._analyze_strokes(columns, timestamps, canvas_size or self.DEFAULT_CANVAS_SIZE),
             "suggestions": []
         }
         
@@ -392,25 +1041,25 @@ class DrawingProgressAnalyzer:
         
         return analysis
     
-    def _analyze_tools_used(self, time_lapse: List[Dict]) -> Dict[str, int]:
-        """Analyze which tools were used"""
-        tools = {}
-        for step in time_lapse:
-            tool = step.get("tool", "unknown")
-            tools[tool] = tools.get(tool, 0) + 1
-        return tools
+    def _action_code(self, columns: TimeLapseColumns, action: str) -> int:
+        """Code of an action in this recording's dictionary, -1 (matching nothing) if unused"""
+        names = columns.dictionaries["action"]
+        return names.index(action) if action in names else -1
+    
+    def _analyze_tools_used(self, columns: TimeLapseColumns, actions: np.ndarray) -> Dict[str, int]:
+        """Analyze which tools were used, in order of first use"""
+        codes, first_seen, counts = np.unique(columns.codes["tool"][actions], return_index=True, return_counts=True)
+        names = ["unknown"] + columns.dictionaries["tool"][1:]
+        order = np.argsort(first_seen)
+        return {names[code]: int(count) for code, count in zip(codes[order].tolist(), counts[order].tolist())}
     
-    def _analyze_drawing_pace(self, time_lapse: List[Dict]) -> str:
+    def _analyze_drawing_pace(self, action_count: int, timestamps: np.ndarray) -> str:
         """Analyze drawing pace"""
-        if len(time_lapse) < 2:
-            return "unknown"
-        
-        timestamps = [step.get("timestamp", 0) for step in time_lapse if step.get("timestamp")]
-        if len(timestamps) < 2:
+        if action_count < 2 or len(timestamps) < 2:
             return "unknown"
         
         total_time = (timestamps[-1] - timestamps[0]) / 1000  # Convert to seconds
-        actions_per_minute = len(time_lapse) / (total_time / 60) if total_time > 0 else 0
+        actions_per_minute = action_count / (total_time / 60) if total_time > 0 else 0
         
         if actions_per_minute > 30:
             return "fast"
@@ -419,15 +1068,70 @@ class DrawingProgressAnalyzer:
         else:
             return "thoughtful"
     
-    def _calculate_complexity_score(self, time_lapse: List[Dict]) -> float:
+    def _calculate_complexity_score(self, action_count: int, tool_variety: int) -> float:
         """Calculate complexity score of the drawing"""
         # Simple heuristic based on number of actions and tool variety
-        action_count = len(time_lapse)
-        tool_variety = len(set(step.get("tool", "unknown") for step in time_lapse))
-        
         complexity = (action_count * 0.7) + (tool_variety * 10)
         return min(complexity, 100.0)
     
+    def _analyze_strokes(self, columns: TimeLapseColumns, timestamps: np.ndarray, canvas_size: tuple) -> Dict[str, Any]:
+        """Stroke length, speed, pause and canvas coverage metrics"""
+        # A stroke runs from a "start" step, through the "move" steps sampled while drawing,
+        # up to the next "start"; "stop" steps have no point of their own
+        stroke_ids = np.cumsum(columns.codes["action"] == self._action_code(columns, "start"))
+        
+        has_point = ~np.isnan(columns.x)
+        x = columns.x[has_point].astype(np.float64)
+        y = columns.y[has_point].astype(np.float64)
+        point_strokes = stroke_ids[has_point]
+        point_times = columns.timestamps[has_point]
+        point_has_time = columns.has_timestamp[has_point]
+        
+        # Segments between consecutive points of the same stroke
+        same_stroke = point_strokes[1:] == point_strokes[:-1]
+        distances = np.hypot(np.diff(x), np.diff(y))[same_stroke]
+        segment_strokes = point_strokes[1:][same_stroke]
+        stroke_lengths = np.bincount(segment_strokes, weights=distances, minlength=int(point_strokes.max(initial=0)) + 1)
+        stroke_lengths = stroke_lengths[np.unique(point_strokes)]
+        
+        durations = (np.diff(point_times) / 1000)[same_stroke]
+        timed = (point_has_time[1:] & point_has_time[:-1])[same_stroke] & (durations > 0)
+        speeds = distances[timed] / durations[timed]
+        
+        pauses = np.clip(np.diff(timestamps) / 1000, 0, None)
+        bucket_edges = [edge for _, edge in self.PAUSE_BUCKETS[1:]]
+        bucket_counts = np.bincount(np.searchsorted(bucket_edges, pauses, side="right"), minlength=len(self.PAUSE_BUCKETS))
+        
+        coverage = 0.0
+        bounding_box = None
+        if len(x):
+            min_x, max_x, min_y, max_y = float(x.min()), float(x.max()), float(y.min()), float(y.max())
+            bounding_box = {"x": round(min_x, 2), "y": round(min_y, 2), "width": round(max_x - min_x, 2), "height": round(max_y - min_y, 2)}
+            canvas_area = canvas_size[0] * canvas_size[1]
+            if canvas_area > 0:
+                coverage = min((max_x - min_x) * (max_y - min_y) / canvas_area, 1.0)
+        
+        speed_percentiles = np.percentile(speeds, [50, 90, 99]) if len(speeds) else np.zeros(3)
+        return {
+            "stroke_count": len(stroke_lengths),
+            "stroke_length": {
+                "total": round(float(stroke_lengths.sum()), 2),
+                "mean": round(float(stroke_lengths.mean()), 2) if len(stroke_lengths) else 0.0,
+                "max": round(float(stroke_lengths.max(initial=0)), 2)
+            },
+            "speed_percentiles": {
+                "p50": round(float(speed_percentiles[0]), 2),
+                "p90": round(float(speed_percentiles[1]), 2),
+                "p99": round(float(speed_percentiles[2]), 2)
+            },
+            "pause_distribution": {
+                **{name: int(count) for (name, _), count in zip(self.PAUSE_BUCKETS, bucket_counts.tolist())},
+                "longest_seconds": round(float(pauses.max(initial=0)), 2)
+            },
+            "bounding_box": bounding_box,
+            "bounding_box_coverage": round(float(coverage), 4)
+        }
+    
     def _generate_progress_suggestions(self, analysis: Dict) -> List[str]:
         """Generate suggestions based on progress analysis"""
         suggestions = []
@@ -0,0 +1,52 @@
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+import aiofiles
+import aiofiles.os
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobStore:
+    """Content-addressed blob storage on the local filesystem.
+
+    Blobs are stored under their SHA-256 digest, so identical canvas payloads are
+    written once and the digest doubles as a strong ETag.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        if not DIGEST_PATTERN.match(digest):
+            raise ValueError(f"Invalid blob digest: {digest}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    async def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        try:
+            # Reusing a blob refreshes its mtime, which keeps scripts/gc_canvas_blobs.py off it
+            await asyncio.get_running_loop().run_in_executor(None, os.utime, path)
+            return digest
+        except FileNotFoundError:
+            pass
+
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary name and rename so readers never see a partial blob
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        async with aiofiles.open(temp_path, "wb") as f:
+            await f.write(data)
+        await aiofiles.os.replace(temp_path, path)
+        return digest
+
+    async def get(self, digest: str) -> bytes:
+        async with aiofiles.open(self.path(digest), "rb") as f:
+            return await f.read()
+
+    async def read_range(self, digest: str, start: int, length: int) -> bytes:
+        async with aiofiles.open(self.path(digest), "rb") as f:
+            await f.seek(start)
+            return await f.read(length)
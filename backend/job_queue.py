@@ -0,0 +1,267 @@
+import asyncio
+import traceback
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class PermanentJobError(Exception):
+    """Raised by handlers for failures that retrying cannot fix, e.g. a missing drawing"""
+
+
+class JobType:
+    """Handler and scheduling settings for one kind of background job"""
+
+    def __init__(self, name: str, handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 priority: int = 0, concurrency: int = 2, max_attempts: int = 3,
+                 retry_delay_seconds: float = 5.0):
+        self.name = name
+        self.handler = handler
+        self.priority = priority
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+        self.running = 0
+
+
+class JobQueue:
+    """MongoDB-backed job queue worked by coroutines in the API process.
+
+    Workers claim the highest priority runnable job whose type is below its concurrency
+    limit. Failed jobs are retried with exponential backoff; jobs whose worker died are
+    picked up again once their lease expires, unless that was their last attempt.
+    """
+
+    def __init__(self, collection, workers: int = 4, poll_interval: float = 1.0, lease_seconds: float = 300.0):
+        self.collection = collection
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.job_types: Dict[str, JobType] = {}
+        self._tasks = []
+        self._wakeup = None
+        self._claim_lock = None
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stopping = False
+
+    def register(self, name: str, handler: Callable[[Dict[str, Any]], Awaitable[Any]], **options):
+        self.job_types[name] = JobType(name, handler, **options)
+
+    async def submit(self, job_type: str, payload: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+        settings = self.job_types[job_type]
+        now = datetime.utcnow()
+        job = {
+            "type": job_type,
+            "payload": payload,
+            "user_id": user_id,
+            "status": "queued",
+            "priority": settings.priority,
+            "attempts": 0,
+            "max_attempts": settings.max_attempts,
+            "run_after": now,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        result = await self.collection.insert_one(job)
+        job["_id"] = result.inserted_id
+        if self._wakeup:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": ObjectId(job_id), "user_id": user_id})
+
+    async def wait(self, job_id: str, user_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Return the job once it finishes or the timeout passes, whichever comes first"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        finished = self._finished.setdefault(job_id, asyncio.Event())
+        self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+        try:
+            while True:
+                job = await self.get(job_id, user_id)
+                remaining = deadline - loop.time()
+                if job is None or job["status"] in TERMINAL_STATUSES or remaining <= 0:
+                    return job
+                # Jobs finished by another process are noticed on the next poll
+                try:
+                    await asyncio.wait_for(finished.wait(), timeout=min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # The event is shared by everyone waiting on the job; the last one out removes it
+            self._waiters[job_id] -= 1
+            if not self._waiters[job_id]:
+                del self._waiters[job_id]
+                self._finished.pop(job_id, None)
+
+    def start(self):
+        self._stopping = False
+        # Created here so they belong to the loop the workers run on
+        self._wakeup = asyncio.Event()
+        self._claim_lock = asyncio.Lock()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": sum(not task.done() for task in self._tasks),
+            "running": {name: job_type.running for name, job_type in self.job_types.items()}
+        }
+
+    async def _worker(self):
+        while not self._stopping:
+            try:
+                # One claim at a time so concurrency limits can't be overshot between workers
+                async with self._claim_lock:
+                    job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job claim error: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_type = self.job_types[job["type"]]
+            try:
+                await self._run(job, job_type)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The job's lease runs out and it is picked up again; this worker carries on
+                print(f"Job {job['_id']} ({job['type']}) worker error: {e}")
+            finally:
+                job_type.running -= 1
+                # A slot for this type opened up; let idle workers look again
+                self._wakeup.set()
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        available = [name for name, job_type in self.job_types.items() if job_type.running < job_type.concurrency]
+        if not available:
+            return None
+
+        now = datetime.utcnow()
+        await self._fail_exhausted(now)
+        job = await self.collection.find_one_and_update(
+            {
+                "type": {"$in": available},
+                "$or": [
+                    {"status": "queued", "run_after": {"$lte": now}},
+                    {
+                        "status": "running", "locked_until": {"$lt": now},
+                        "$expr": {"$lt": ["$attempts", "$max_attempts"]}
+                    }
+                ]
+            },
+            {
+                "$set": {
+                    "status": "running", "started_at": now, "updated_at": now,
+                    "locked_until": now + timedelta(seconds=self.lease_seconds), "lease_id": ObjectId()
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("priority", -1), ("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            return None
+
+        self.job_types[job["type"]].running += 1
+        return job
+
+    async def _fail_exhausted(self, now: datetime):
+        """Fail jobs whose lease expired on their last attempt, e.g. because they kill or hang
+        their worker; reclaiming them would retry them forever"""
+        await self.collection.update_many(
+            {
+                "status": "running", "locked_until": {"$lt": now},
+                "$expr": {"$gte": ["$attempts", "$max_attempts"]}
+            },
+            {
+                "$set": {
+                    "status": "failed", "error": "Worker stopped responding on the last attempt",
+                    "updated_at": now, "finished_at": now
+                },
+                "$unset": {"locked_until": "", "lease_id": ""}
+            }
+        )
+
+    async def _run(self, job: Dict[str, Any], job_type: JobType):
+        # Writes only apply while this worker still holds the lease, so a worker that lost
+        # the job to another one after its lease expired can't overwrite the newer outcome
+        owned = {"_id": job["_id"], "status": "running", "lease_id": job["lease_id"]}
+        renewal = asyncio.ensure_future(self._renew_lease(job, owned))
+        try:
+            result = await job_type.handler(job["payload"])
+        except asyncio.CancelledError:
+            # Shutting down; the lease expires and another worker retries the job
+            raise
+        except Exception as e:
+            print(f"Job {job['_id']} ({job['type']}) failed: {e}")
+            update = self._failure_update(job, job_type, e)
+        else:
+            now = datetime.utcnow()
+            update = {"status": "completed", "result": result, "error": None, "updated_at": now, "finished_at": now}
+        finally:
+            renewal.cancel()
+
+        release = {"locked_until": "", "lease_id": ""}
+        try:
+            stored = await self.collection.update_one(owned, {"$set": update, "$unset": release})
+        except Exception as e:
+            if update["status"] != "completed":
+                raise
+            # e.g. a result MongoDB can't encode; retrying would produce the same result
+            print(f"Job {job['_id']} ({job['type']}) result could not be stored: {e}")
+            update = self._failure_update(job, job_type, PermanentJobError(f"Result could not be stored: {e}"))
+            stored = await self.collection.update_one(owned, {"$set": update, "$unset": release})
+        if not stored.matched_count:
+            print(f"Job {job['_id']} ({job['type']}) lease was lost; outcome discarded")
+            return
+
+        finished = self._finished.get(str(job["_id"]))
+        if finished:
+            finished.set()
+
+    def _failure_update(self, job: Dict[str, Any], job_type: JobType, error: Exception) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        update = {"error": str(error), "updated_at": now, "traceback": traceback.format_exc(limit=5)}
+        if job["attempts"] < job["max_attempts"] and not isinstance(error, PermanentJobError):
+            delay = job_type.retry_delay_seconds * 2 ** (job["attempts"] - 1)
+            update.update({"status": "queued", "run_after": now + timedelta(seconds=delay)})
+        else:
+            update.update({"status": "failed", "finished_at": now})
+        return update
+
+    async def _renew_lease(self, job: Dict[str, Any], owned: Dict[str, Any]):
+        """Extend the lease of a job whose handler is still running, well before it expires"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await self.collection.update_one(
+                    owned, {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+                )
+            except Exception as e:
+                print(f"Job {job['_id']} ({job['type']}) lease renewal error: {e}")
+                continue
+            if not renewed.matched_count:
+                return
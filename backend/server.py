@@ -1,9 +1,13 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, BackgroundTasks, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, RedirectResponse, ORJSONResponse
 from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import Any, Optional, List
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 from jose import JWTError, jwt
@@ -12,19 +16,39 @@ from dotenv import load_dotenv
 import uuid
 from bson import ObjectId
 import json
+import base64
+import hashlib
+import hmac
+import zlib
+import orjson
+import asyncio
+import time
 import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import os
 
 # Add current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from ai_services import story_generator, interest_analyzer, progress_analyzer
+from timelapse_codec import TIMESTAMP_LIMIT, pack_time_lapse, unpack_time_lapse, append_time_lapse
+from job_queue import JobQueue, PermanentJobError
+from blob_store import BlobStore
+from compression import CompressionMiddleware
+from thumbnails import (
+    THUMBNAIL_SIZES, THUMBNAIL_FORMATS, RENDERER_VERSION, ThumbnailCache,
+    render_paperjs, resize_image, encode_image
+)
 
 # Load environment variables
 load_dotenv()
 
 # Initialize FastAPI app
-app = FastAPI(title="Draw-a-Tale API", version="1.0.0")
+app = FastAPI(title="Draw-a-Tale API", version="1.0.0", default_response_class=ORJSONResponse)
+
+# Compress larger JSON responses; added first so it wraps the app inside CORS
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024")))
 
 # CORS middleware
 app.add_middleware(
@@ -33,18 +57,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Content-Range", "Accept-Ranges"],
 )
 
 # Security
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds == max_rounds == default_rounds so hashes made with any other cost are
+# rehashed on login, whether BCRYPT_ROUNDS was raised or lowered
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+# bcrypt is CPU bound, so it runs in a small dedicated pool instead of on the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+password_hash_stats = {"pending": 0, "completed": 0, "rehashed": 0}
 
 # Environment variables
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+MAX_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 100
+MAX_CHILDREN_PER_PARENT = 50
+MAX_RECENT_DRAWINGS = 12
+# "aggregate" counts interest keywords inside MongoDB; "stream" reads only title/description
+INTEREST_COUNT_MODE = os.getenv("INTEREST_COUNT_MODE", "aggregate")
+STORY_CACHE_PERSIST = os.getenv("STORY_CACHE_PERSIST", "true").lower() == "true"
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+MAX_JOB_WAIT_SECONDS = 30
+# Autosaved steps collect unpacked in time_lapse_tail until there are this many
+TIME_LAPSE_TAIL_LIMIT = int(os.getenv("TIME_LAPSE_TAIL_LIMIT", "1000"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
 DATABASE_NAME = os.getenv("DATABASE_NAME", "draw_a_tale")
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "blobs"))
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "thumbnail_cache"))
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv("THUMBNAIL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
 
 # MongoDB connection
 client = AsyncIOMotorClient(MONGO_URL)
@@ -56,6 +112,67 @@ drawings_collection = db.drawings
 progress_collection = db.progress
 stories_collection = db.stories
 quests_collection = db.quests
+profiles_collection = db.interest_profiles
+story_cache_collection = db.story_cache
+jobs_collection = db.jobs
+progress_summaries_collection = db.progress_summaries
+
+# Heavy canvas payloads live in the blob store; drawings only keep references to them
+blob_store = BlobStore(BLOB_STORE_DIR)
+CANVAS_BLOB_FIELDS = {
+    "paperjs": "application/json",
+    "svg": "image/svg+xml",
+    "thumbnail": "text/plain"
+}
+# Storage layout of a drawing's canvas, recorded in its canvas_format field:
+#   missing - canvas_data holds every field inline
+#   1       - paperjs/svg/thumbnail in the blob store, stored as-is
+#   2       - as 1, with the text fields zlib compressed (ref["compression"])
+CANVAS_FORMAT_VERSION = 2
+COMPRESSED_CANVAS_FIELDS = ("paperjs", "svg")
+CANVAS_COMPRESSION_LEVEL = 6
+thumbnail_cache = ThumbnailCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES)
+
+# Indexes created on startup; listings sort on (created_at, _id) so both are part of the key
+IDEMPOTENCY_INDEX_OPTIONS = {
+    "unique": True,
+    "name": "user_idempotency_key",
+    "partialFilterExpression": {"idempotency_key": {"$type": "string"}}
+}
+COLLECTION_INDEXES = {
+    "users": [
+        ([("email", ASCENDING)], {"unique": True, "name": "email_unique"}),
+        ([("parent_id", ASCENDING), ("created_at", ASCENDING)], {"name": "parent_created"}),
+    ],
+    "drawings": [
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "user_created"}),
+        ([("user_id", ASCENDING), ("idempotency_key", ASCENDING)], IDEMPOTENCY_INDEX_OPTIONS),
+    ],
+    "stories": [
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "user_created"}),
+    ],
+    "interest_profiles": [
+        ([("user_id", ASCENDING)], {"unique": True, "name": "user_unique"}),
+    ],
+    "story_cache": [
+        ([("created_at", ASCENDING)], {"name": "created_ttl", "expireAfterSeconds": int(story_generator.cache.ttl_seconds)}),
+    ],
+    "jobs": [
+        ([("status", ASCENDING), ("type", ASCENDING), ("priority", DESCENDING), ("created_at", ASCENDING)], {"name": "claim_order"}),
+        ([("user_id", ASCENDING), ("created_at", DESCENDING)], {"name": "user_created"}),
+        ([("finished_at", ASCENDING)], {"name": "finished_ttl", "expireAfterSeconds": JOB_RETENTION_SECONDS}),
+    ],
+    "progress": [
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "user_created"}),
+        # Progress is upserted per quest; scripts/merge_progress_duplicates.py fixes older data
+        ([("user_id", ASCENDING), ("quest_id", ASCENDING)], {"unique": True, "name": "user_quest_unique"}),
+    ],
+    "progress_summaries": [
+        ([("user_id", ASCENDING)], {"unique": True, "name": "user_unique"}),
+    ],
+}
+index_status = {name: "pending" for name in COLLECTION_INDEXES}
+index_build_task = None
 
 # Pydantic models
 class UserBase(BaseModel):
@@ -81,6 +198,14 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+def check_time_lapse_steps(steps: Optional[List[dict]]) -> Optional[List[dict]]:
+    """Reject timestamps too large for BSON and JSON integers, which would fail on save or read"""
+    for step in steps or []:
+        timestamp = step.get("timestamp")
+        if isinstance(timestamp, int) and not -TIMESTAMP_LIMIT < timestamp < TIMESTAMP_LIMIT:
+            raise ValueError(f"timestamp {timestamp} is out of range")
+    return steps
+
 class DrawingBase(BaseModel):
     title: str
     description: Optional[str] = None
@@ -88,12 +213,62 @@ class DrawingBase(BaseModel):
     time_lapse: Optional[List[dict]] = None
     quest_id: Optional[str] = None
 
+    @field_validator("time_lapse")
+    @classmethod
+    def check_time_lapse(cls, steps):
+        return check_time_lapse_steps(steps)
+
 class DrawingCreate(DrawingBase):
     pass
 
 class DrawingResponse(DrawingBase):
     id: str
     user_id: str
+    version: int = 0
+    canvas_urls: Optional[dict] = None
+    thumbnail_url: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+class DrawingUpdate(BaseModel):
+    # The version the client last saw; omit to overwrite regardless
+    version: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    canvas_data: Optional[dict] = None
+    time_lapse: Optional[List[dict]] = None
+    time_lapse_append: Optional[List[dict]] = None
+    quest_id: Optional[str] = None
+
+    @field_validator("title", "canvas_data")
+    @classmethod
+    def check_not_null(cls, value, info):
+        # Optional only so they can be left out; a stored drawing always has both
+        if value is None:
+            raise ValueError(f"{info.field_name} can't be null")
+        return value
+
+    @field_validator("time_lapse", "time_lapse_append")
+    @classmethod
+    def check_time_lapse(cls, steps):
+        return check_time_lapse_steps(steps)
+
+class DrawingReplace(DrawingCreate):
+    # As in DrawingUpdate
+    version: Optional[int] = None
+
+class DrawingUpdateResponse(BaseModel):
+    id: str
+    version: int
+    thumbnail_url: str
+    updated_at: datetime
+
+class DrawingSummaryResponse(BaseModel):
+    id: str
+    title: str
+    description: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    quest_id: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -110,6 +285,21 @@ class StoryResponse(StoryBase):
     id: str
     user_id: str
     created_at: datetime
+    generated_with: Optional[str] = None
+
+class JobCreate(BaseModel):
+    type: str  # story_generation or drawing_analysis
+    payload: dict
+
+class JobResponse(BaseModel):
+    id: str
+    type: str
+    status: str  # queued, running, completed, failed
+    attempts: int
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
 
 class ProgressBase(BaseModel):
     quest_id: str
@@ -126,12 +316,116 @@ class ProgressResponse(ProgressBase):
     created_at: datetime
     updated_at: datetime
 
+# Batch uploads from devices that were offline; an idempotency key makes a replayed item a no-op
+class DrawingBatchItem(DrawingCreate):
+    idempotency_key: Optional[str] = Field(None, max_length=200)
+
+class BatchRequest(BaseModel):
+    # Items are validated one by one so a bad item doesn't reject the whole batch
+    items: List[Any] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str  # created, updated, duplicate, invalid, failed
+    id: Optional[str] = None
+    idempotency_key: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    created: int
+    updated: int = 0
+    duplicates: int
+    failed: int
+
+# Parent portal overview, one entry per linked child
+class ChildOverview(BaseModel):
+    id: str
+    username: str
+    age: Optional[int] = None
+    drawing_count: int
+    story_count: int
+    quests_started: int
+    completed_quests: int
+    skill_level: str
+    top_interests: List[str]
+    recent_drawings: List[DrawingSummaryResponse]
+
+class ParentOverviewResponse(BaseModel):
+    children: List[ChildOverview]
+    total_drawings: int
+    total_stories: int
+    total_completed_quests: int
+
+# Authenticated user cache
+class UserCache:
+    """In-process LRU cache of user documents with a TTL, keyed by user id"""
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        # Handlers mutate the user dict (convert_mongo_document), so hand out copies
+        return dict(entry[1])
+    
+    def set(self, user_id: str, user: dict):
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, dict(user))
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+    
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
 # Helper functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def run_password_task(func, *args):
+    """Run a passlib call in the bcrypt pool, tracking how many calls are waiting"""
+    loop = asyncio.get_running_loop()
+    password_hash_stats["pending"] += 1
+    try:
+        return await loop.run_in_executor(password_executor, func, *args)
+    finally:
+        password_hash_stats["pending"] -= 1
+        password_hash_stats["completed"] += 1
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def get_password_queue_stats():
+    pending = password_hash_stats["pending"]
+    return {
+        **password_hash_stats,
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_depth": max(pending - PASSWORD_HASH_WORKERS, 0)
+    }
+
+async def verify_password(plain_password, hashed_password):
+    """Returns (is_valid, new_hash) - new_hash is set when the stored hash uses outdated settings"""
+    return await run_password_task(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await run_password_task(pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -157,9 +451,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
     user = await users_collection.find_one({"_id": ObjectId(user_id)})
     if user is None:
         raise credentials_exception
+    user_cache.set(user_id, user)
     return user
 
 # Custom JSON encoder for MongoDB ObjectId
@@ -169,6 +468,33 @@ class JSONEncoder(json.JSONEncoder):
             return str(obj)
         return super().default(obj)
 
+def orjson_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class MongoJSONResponse(ORJSONResponse):
+    """Serializes converted MongoDB documents with orjson, ObjectIds included"""
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=orjson_default)
+
+def shape_document(model, doc: dict) -> dict:
+    """The fields response_model would keep, without validating a trusted document"""
+    return {
+        name: doc.get(name, None if field.is_required() else field.default)
+        for name, field in model.model_fields.items()
+    }
+
+def documents_response(model, docs: list, response: Optional[Response] = None) -> MongoJSONResponse:
+    """Fast path for listings: documents go straight to orjson instead of through Pydantic"""
+    headers = dict(response.headers) if response is not None else None
+    return MongoJSONResponse([shape_document(model, doc) for doc in docs], headers=headers)
+
+def mongo_now() -> datetime:
+    """Current UTC time at the millisecond precision MongoDB stores, so it can be matched on later"""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
 # Helper to convert MongoDB documents
 def convert_mongo_document(doc):
     if doc:
@@ -176,6 +502,549 @@ def convert_mongo_document(doc):
         del doc["_id"]
     return doc
 
+async def convert_drawing_document(doc):
+    doc = convert_mongo_document(doc)
+    doc["time_lapse"] = unpack_time_lapse(doc.get("time_lapse")) + doc.pop("time_lapse_tail", [])
+    refs = doc.pop("canvas_blobs", None) or {}
+    if refs:
+        doc["canvas_data"] = await load_canvas_data(doc.get("canvas_data"), refs)
+        doc["canvas_urls"] = {field: canvas_blob_url(doc["id"], field) for field in refs}
+    doc["thumbnail_url"] = thumbnail_url(doc["id"], doc["updated_at"])
+    return doc
+
+# Canvas blob helpers
+def canvas_blob_url(drawing_id: str, field: str) -> str:
+    return f"/api/drawings/{drawing_id}/canvas/{field}"
+
+# Thumbnail URLs are signed so <img> tags can load them without an Authorization header;
+# the version changes whenever the drawing is saved, which lets browsers cache them forever
+def thumbnail_version(updated_at: datetime) -> str:
+    # Millisecond precision, matching what MongoDB stores
+    return format((updated_at - datetime(1970, 1, 1)) // timedelta(milliseconds=1), "x")
+
+def thumbnail_signature(drawing_id: str, version: str) -> str:
+    message = f"thumbnail:{drawing_id}:{version}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+def thumbnail_url(drawing_id: str, updated_at: datetime, size: str = "small", image_format: str = "webp") -> str:
+    version = thumbnail_version(updated_at)
+    signature = thumbnail_signature(drawing_id, version)
+    return f"/api/drawings/{drawing_id}/thumbnail?size={size}&format={image_format}&v={version}&sig={signature}"
+
+def build_thumbnail(paperjs, image_data: Optional[bytes], canvas_size: tuple, size: str, image_format: str) -> Optional[bytes]:
+    """Encoded thumbnail variant, rendered from the paper.js project when there is one.
+
+    The uploaded thumbnail is only a fallback since the canvas renders it before
+    anything has been drawn on it.
+    """
+    box = THUMBNAIL_SIZES[size]
+    image = None
+    if paperjs is not None:
+        try:
+            image = render_paperjs(paperjs, canvas_size, box)
+        except Exception as e:
+            print(f"Thumbnail render error: {e}")
+    if image is None and image_data is not None:
+        try:
+            image = resize_image(image_data, box)
+        except Exception as e:
+            print(f"Thumbnail resize error: {e}")
+    if image is None:
+        return None
+    return encode_image(image, image_format)
+
+async def read_canvas_field(drawing: dict, field: str):
+    """A canvas field's value from the blob store or, for older drawings, inline"""
+    ref = (drawing.get("canvas_blobs") or {}).get(field)
+    if ref is None:
+        return (drawing.get("canvas_data") or {}).get(field)
+    try:
+        return decode_canvas_blob(await read_canvas_blob(ref), ref)
+    except FileNotFoundError:
+        print(f"Canvas blob {ref['digest']} missing for drawing {drawing['_id']}")
+        return None
+
+def encode_canvas_blob(field: str, value) -> tuple:
+    """Bytes to store for a canvas field, plus how to turn them back into the original value"""
+    if isinstance(value, str) and value.startswith("data:") and ";base64," in value:
+        # Data URL thumbnails are stored as the decoded image so they can be served directly
+        header, encoded = value.split(",", 1)
+        try:
+            return base64.b64decode(encoded, validate=True), {"content_type": header[5:-7] or "application/octet-stream", "encoding": "data-url"}
+        except ValueError:
+            pass
+    if isinstance(value, str):
+        return value.encode("utf-8"), {"content_type": CANVAS_BLOB_FIELDS[field], "encoding": "text"}
+    return json.dumps(value).encode("utf-8"), {"content_type": "application/json", "encoding": "json"}
+
+def decode_canvas_blob(data: bytes, ref: dict):
+    if ref["encoding"] == "data-url":
+        return f"data:{ref['content_type']};base64,{base64.b64encode(data).decode()}"
+    if ref["encoding"] == "json":
+        return json.loads(data)
+    return data.decode("utf-8")
+
+async def read_canvas_blob(ref: dict) -> bytes:
+    """The uncompressed bytes behind a blob ref"""
+    data = await blob_store.get(ref["digest"])
+    if ref.get("compression") == "zlib":
+        return zlib.decompress(data)
+    return data
+
+async def store_canvas_blobs(canvas_data: dict) -> tuple:
+    """Move heavy canvas fields into the blob store; returns (inline canvas data, blob refs)
+
+    paper.js JSON and SVG are highly repetitive text and are compressed before storing.
+    ref["size"] is always the uncompressed length.
+    """
+    inline = dict(canvas_data)
+    refs = {}
+    loop = asyncio.get_running_loop()
+    for field in CANVAS_BLOB_FIELDS:
+        value = inline.pop(field, None)
+        if value is None:
+            continue
+        data, ref = encode_canvas_blob(field, value)
+        ref["size"] = len(data)
+        if field in COMPRESSED_CANVAS_FIELDS:
+            data = await loop.run_in_executor(None, zlib.compress, data, CANVAS_COMPRESSION_LEVEL)
+            ref["compression"] = "zlib"
+            ref["stored_size"] = len(data)
+        ref["digest"] = await blob_store.put(data)
+        refs[field] = ref
+    return inline, refs
+
+async def load_canvas_data(canvas_data: Optional[dict], refs: dict) -> dict:
+    """Inline canvas data with the blob fields read back in"""
+    canvas_data = dict(canvas_data or {})
+    fields = list(refs)
+    blobs = await asyncio.gather(*(read_canvas_blob(refs[field]) for field in fields), return_exceptions=True)
+    for field, data in zip(fields, blobs):
+        if isinstance(data, Exception):
+            print(f"Canvas blob read error for {field}: {data}")
+            continue
+        canvas_data[field] = decode_canvas_blob(data, refs[field])
+    return canvas_data
+
+def parse_range_header(range_header: str, size: int) -> Optional[tuple]:
+    """(start, end) inclusive for a single "bytes=" range, or None if it can't be satisfied"""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    start, _, end = spec.strip().partition("-")
+    try:
+        if not start:
+            # Suffix range: the last N bytes
+            length = int(end)
+            if length <= 0:
+                return None
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return None
+    return start, end
+
+# Interest profiles keep running keyword counts so interest reads don't rescan drawings
+def empty_interest_profile(user_id: str) -> dict:
+    return {
+        "user_id": user_id,
+        "category_matches": dict.fromkeys(interest_analyzer.interest_categories, 0),
+        "total_words": 0,
+        "drawing_count": 0,
+        "updated_at": datetime.utcnow()
+    }
+
+async def update_interest_profile(user_id: str, drawings: List[dict], direction: int = 1):
+    """Add (direction=1) or remove (direction=-1) drawings' counts from the user's profile"""
+    increments = {"total_words": 0, "drawing_count": direction * len(drawings)}
+    for drawing in drawings:
+        category_matches, word_count = interest_analyzer.count_text_matches(interest_analyzer.drawing_text(drawing))
+        for category, count in category_matches.items():
+            if count:
+                key = f"category_matches.{category}"
+                increments[key] = increments.get(key, 0) + direction * count
+        increments["total_words"] += direction * word_count
+    # Profiles that don't exist yet are built from all drawings on the first read; the
+    # revision tells a build running concurrently that its count may have missed this change
+    increments["revision"] = 1
+    await profiles_collection.update_one(
+        {"user_id": user_id},
+        {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}}
+    )
+
+async def count_interest_keywords(user_id: str) -> dict:
+    """Interest profile counts over all of a user's drawings, computed from scratch"""
+    profile = empty_interest_profile(user_id)
+    if INTEREST_COUNT_MODE == "aggregate":
+        try:
+            pipeline = interest_analyzer.keyword_count_pipeline({"user_id": user_id})
+            results = await drawings_collection.aggregate(pipeline).to_list(1)
+            category_matches, total_words, drawing_count = interest_analyzer.counts_from_pipeline(results[0] if results else None)
+            profile.update(category_matches=category_matches, total_words=total_words, drawing_count=drawing_count)
+            return profile
+        except Exception as e:
+            # e.g. servers older than MongoDB 4.2, which lack $regexFindAll
+            print(f"Interest aggregation error, streaming text fields instead: {e}")
+    
+    cursor = drawings_collection.find({"user_id": user_id}, {"_id": 0, "title": 1, "description": 1})
+    async for drawing in cursor:
+        category_matches, word_count = interest_analyzer.count_text_matches(interest_analyzer.drawing_text(drawing))
+        for category, count in category_matches.items():
+            profile["category_matches"][category] += count
+        profile["total_words"] += word_count
+        profile["drawing_count"] += 1
+    return profile
+
+async def get_interest_profile(user_id: str, rebuild: bool = False) -> dict:
+    profile = await profiles_collection.find_one({"user_id": user_id})
+    if profile and not rebuild and not profile.get("needs_rebuild"):
+        return profile
+    
+    # Users from before interest profiles existed get theirs built once; a rebuild replaces the counts.
+    # A placeholder goes in first so drawings saved during the count bump its revision, and the
+    # counts are only written if the revision is still the one the count started from
+    if profile is None:
+        profile = await profiles_collection.find_one_and_update(
+            {"user_id": user_id},
+            {"$setOnInsert": {"user_id": user_id, "needs_rebuild": True}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    for _ in range(3):
+        revision = profile.get("revision", 0)
+        counts = await count_interest_keywords(user_id)
+        result = await profiles_collection.update_one(
+            {"user_id": user_id, "revision": revision if revision else {"$in": [0, None]}},
+            {"$set": {**counts, "needs_rebuild": False}}
+        )
+        if result.matched_count:
+            return counts
+        profile = await profiles_collection.find_one({"user_id": user_id})
+    # Still changing under us; the placeholder stays marked and the next read tries again
+    return counts
+
+# Progress summaries hold what hints and recommendations need, so they read one small document
+def skill_level_for(completed_quests: int) -> str:
+    if completed_quests >= 6:
+        return "advanced"
+    if completed_quests >= 3:
+        return "intermediate"
+    return "beginner"
+
+async def refresh_progress_summary(user_id: str) -> dict:
+    """Rebuild a user's summary; progress holds one document per quest so this stays small"""
+    quest_ids = set()
+    completed_quest_ids = set()
+    async for progress in progress_collection.find({"user_id": user_id}, {"quest_id": 1, "status": 1}):
+        quest_ids.add(progress["quest_id"])
+        if progress.get("status") == "completed":
+            completed_quest_ids.add(progress["quest_id"])
+    summary = {
+        "user_id": user_id,
+        "quest_ids": sorted(quest_ids),
+        "completed_quests": len(completed_quest_ids),
+        "skill_level": skill_level_for(len(completed_quest_ids)),
+        "updated_at": datetime.utcnow()
+    }
+    await progress_summaries_collection.update_one({"user_id": user_id}, {"$set": summary}, upsert=True)
+    return summary
+
+async def get_progress_summary(user_id: str) -> dict:
+    summary = await progress_summaries_collection.find_one({"user_id": user_id})
+    if summary:
+        return summary
+    # Users from before summaries existed get theirs built on first read
+    return await refresh_progress_summary(user_id)
+
+def progress_update(progress: ProgressCreate, now: datetime, new_id: Optional[ObjectId] = None) -> dict:
+    """Upsert for one quest: completion only goes up, badges accumulate and completed is final"""
+    update = {
+        "$max": {"completion_percentage": progress.completion_percentage},
+        "$addToSet": {"badges_earned": {"$each": progress.badges_earned}},
+        "$set": {"updated_at": now},
+        "$setOnInsert": {"created_at": now}
+    }
+    if progress.status == "completed":
+        update["$set"]["status"] = "completed"
+    else:
+        update["$setOnInsert"]["status"] = progress.status
+    if new_id is not None:
+        update["$setOnInsert"]["_id"] = new_id
+    return update
+
+def merge_progress_items(items: List[ProgressCreate]) -> ProgressCreate:
+    """Several updates to one quest in a batch, combined the way the upsert would apply them"""
+    badges = []
+    for item in items:
+        badges.extend(badge for badge in item.badges_earned if badge not in badges)
+    completed = any(item.status == "completed" for item in items)
+    return ProgressCreate(
+        quest_id=items[0].quest_id,
+        status="completed" if completed else items[0].status,
+        completion_percentage=max(item.completion_percentage for item in items),
+        badges_earned=badges
+    )
+
+async def get_user_interest_scores(user_id: str, rebuild: bool = False):
+    """Interest scores and the number of drawings they are based on"""
+    profile = await get_interest_profile(user_id, rebuild)
+    if not profile.get("drawing_count"):
+        return {}, 0
+    interests = interest_analyzer.scores_from_counts(profile["category_matches"], profile["total_words"])
+    return interests, profile["drawing_count"]
+
+# Story counts live on the user document so overviews don't count each child's stories
+async def increment_story_count(user_id: str):
+    # Users from before the counter existed are backfilled on first read instead
+    await users_collection.update_one(
+        {"_id": ObjectId(user_id), "story_count": {"$exists": True}},
+        {"$inc": {"story_count": 1}}
+    )
+
+async def backfill_story_count(user_id: str) -> int:
+    count = await stories_collection.count_documents({"user_id": user_id})
+    await users_collection.update_one(
+        {"_id": ObjectId(user_id), "story_count": {"$exists": False}},
+        {"$set": {"story_count": count}}
+    )
+    return count
+
+# Keyset pagination helpers - listings are sorted newest first on (created_at, _id)
+def encode_cursor(doc) -> str:
+    raw = json.dumps({"t": doc["created_at"].isoformat(), "id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(raw["t"])
+        last_id = ObjectId(raw["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": last_id}}
+    ]}
+
+async def fetch_page(collection, query: dict, limit: int, cursor: Optional[str], response: Response, projection: Optional[dict] = None):
+    """Fetch one page of documents and set X-Next-Cursor when more remain"""
+    if cursor:
+        query = {"$and": [query, decode_cursor(cursor)]}
+    docs = await collection.find(query, projection).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1])
+    return docs
+
+# Only the fields the gallery needs - no canvas paths, SVG or time-lapse
+DRAWING_SUMMARY_PROJECTION = {
+    "title": 1,
+    "description": 1,
+    "quest_id": 1,
+    "created_at": 1,
+    "updated_at": 1
+}
+
+def convert_drawing_summary(doc):
+    doc = convert_mongo_document(doc)
+    doc["thumbnail_url"] = thumbnail_url(doc["id"], doc["updated_at"])
+    return doc
+
+# Parent overview: each child's rollups are joined onto the user document in one aggregation,
+# so the cost doesn't depend on how many drawings, stories or progress documents a child has
+def children_overview_pipeline(parent_id: str, recent: int) -> list:
+    return [
+        {"$match": {"parent_id": parent_id}},
+        {"$sort": {"created_at": 1}},
+        {"$limit": MAX_CHILDREN_PER_PARENT},
+        {"$project": {"username": 1, "age": 1, "story_count": 1, "user_id": {"$toString": "$_id"}}},
+        {"$lookup": {
+            "from": profiles_collection.name,
+            "localField": "user_id",
+            "foreignField": "user_id",
+            "as": "interest_profile"
+        }},
+        {"$lookup": {
+            "from": progress_summaries_collection.name,
+            "localField": "user_id",
+            "foreignField": "user_id",
+            "as": "progress_summary"
+        }},
+        # Newest drawings first, read from the user_created index
+        {"$lookup": {
+            "from": drawings_collection.name,
+            "let": {"user_id": "$user_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$user_id", "$$user_id"]}}},
+                {"$sort": {"created_at": -1, "_id": -1}},
+                {"$limit": recent},
+                {"$project": DRAWING_SUMMARY_PROJECTION}
+            ],
+            "as": "recent_drawings"
+        }}
+    ]
+
+async def build_child_overview(child: dict) -> ChildOverview:
+    user_id = child["user_id"]
+    # Children from before the rollups existed get them built on first read
+    profile = child["interest_profile"][0] if child["interest_profile"] else None
+    if profile is None or profile.get("needs_rebuild"):
+        profile = await get_interest_profile(user_id)
+    summary = child["progress_summary"][0] if child["progress_summary"] else await refresh_progress_summary(user_id)
+    story_count = child["story_count"] if "story_count" in child else await backfill_story_count(user_id)
+    interests = {}
+    if profile.get("drawing_count"):
+        interests = interest_analyzer.scores_from_counts(profile["category_matches"], profile["total_words"])
+    return ChildOverview(
+        id=user_id,
+        username=child["username"],
+        age=child.get("age"),
+        drawing_count=profile.get("drawing_count", 0),
+        story_count=story_count,
+        quests_started=len(summary["quest_ids"]),
+        completed_quests=summary["completed_quests"],
+        skill_level=summary["skill_level"],
+        top_interests=[k for k, v in sorted(interests.items(), key=lambda x: x[1], reverse=True)[:3]],
+        recent_drawings=[convert_drawing_summary(drawing) for drawing in child["recent_drawings"]]
+    )
+
+# Batch write helpers
+def validate_batch_items(model, items: List[Any], results: dict) -> list:
+    """Parse each item with model; failures are recorded in results as invalid"""
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model(**item)))
+        except (ValidationError, TypeError) as e:
+            if isinstance(e, ValidationError):
+                error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            else:
+                error = "Item must be an object"
+            results[index] = BatchItemResult(index=index, status="invalid", error=error)
+    return valid
+
+async def insert_batch(collection, user_id: str, entries: list, results: dict) -> list:
+    """insert_many(ordered=False) of (index, document) pairs, recording a result per item.
+
+    Items whose idempotency key was already stored, by an earlier request or earlier in
+    this batch, are reported as duplicates with the existing id. Returns the (index,
+    document) pairs that were inserted.
+    """
+    first_by_key = {}
+    to_insert = []
+    repeats = []
+    for index, doc in entries:
+        key = doc.get("idempotency_key")
+        if key is not None and key in first_by_key:
+            repeats.append((index, first_by_key[key]))
+            continue
+        if key is not None:
+            first_by_key[key] = index
+        to_insert.append((index, doc))
+
+    write_errors = {}
+    if to_insert:
+        try:
+            await collection.insert_many([doc for _, doc in to_insert], ordered=False)
+        except BulkWriteError as e:
+            write_errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+    inserted = []
+    duplicate_keys = {}
+    for position, (index, doc) in enumerate(to_insert):
+        key = doc.get("idempotency_key")
+        error = write_errors.get(position)
+        if error is None:
+            inserted.append((index, doc))
+            results[index] = BatchItemResult(index=index, status="created", id=str(doc["_id"]), idempotency_key=key)
+        elif error.get("code") == 11000 and key is not None:
+            duplicate_keys[key] = index
+        else:
+            results[index] = BatchItemResult(index=index, status="failed", idempotency_key=key, error=error.get("errmsg", "Write failed"))
+
+    if duplicate_keys:
+        existing = collection.find({"user_id": user_id, "idempotency_key": {"$in": list(duplicate_keys)}}, {"idempotency_key": 1})
+        async for doc in existing:
+            index = duplicate_keys.pop(doc["idempotency_key"])
+            results[index] = BatchItemResult(index=index, status="duplicate", id=str(doc["_id"]), idempotency_key=doc["idempotency_key"])
+        for key, index in duplicate_keys.items():
+            results[index] = BatchItemResult(index=index, status="failed", idempotency_key=key, error="Duplicate idempotency key")
+
+    for index, first_index in repeats:
+        first = results[first_index]
+        if first.status in ("created", "duplicate"):
+            results[index] = BatchItemResult(index=index, status="duplicate", id=first.id, idempotency_key=first.idempotency_key)
+        else:
+            results[index] = BatchItemResult(index=index, status=first.status, idempotency_key=first.idempotency_key, error=first.error)
+    return inserted
+
+def batch_response(results: dict) -> BatchResponse:
+    ordered = [results[index] for index in sorted(results)]
+    return BatchResponse(
+        results=ordered,
+        created=sum(result.status == "created" for result in ordered),
+        updated=sum(result.status == "updated" for result in ordered),
+        duplicates=sum(result.status == "duplicate" for result in ordered),
+        failed=sum(result.status in ("invalid", "failed") for result in ordered)
+    )
+
+# Startup
+@app.on_event("startup")
+async def configure_story_cache():
+    if STORY_CACHE_PERSIST:
+        story_generator.cache.collection = story_cache_collection
+
+async def sync_ttl_index(collection, options: dict):
+    """Apply a changed expireAfterSeconds in place; create_index would fail with IndexOptionsConflict"""
+    existing = (await collection.index_information()).get(options["name"])
+    if existing and existing.get("expireAfterSeconds") != options["expireAfterSeconds"]:
+        await db.command("collMod", collection.name, index={
+            "name": options["name"],
+            "expireAfterSeconds": options["expireAfterSeconds"]
+        })
+
+async def build_indexes():
+    """Create collection indexes; create_index is a no-op when an index already exists"""
+    for name, indexes in COLLECTION_INDEXES.items():
+        index_status[name] = "building"
+        try:
+            for keys, options in indexes:
+                if "expireAfterSeconds" in options:
+                    await sync_ttl_index(db[name], options)
+                await db[name].create_index(keys, **options)
+            index_status[name] = "ready"
+        except Exception as e:
+            print(f"Index creation error on {name}: {e}")
+            index_status[name] = f"failed: {str(e)}"
+
+@app.on_event("startup")
+async def ensure_indexes():
+    # Builds on large collections can take a while; requests are served meanwhile
+    global index_build_task
+    index_build_task = asyncio.ensure_future(build_indexes())
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_queue.stop()
+
+@app.on_event("shutdown")
+async def stop_index_builds():
+    if index_build_task and not index_build_task.done():
+        index_build_task.cancel()
+
+@app.on_event("shutdown")
+async def close_ai_clients():
+    await story_generator.aclose()
+
 # API Routes
 
 @app.get("/")
@@ -184,7 +1053,18 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.utcnow(),
+        "indexes": index_status,
+        "password_hashing": get_password_queue_stats(),
+        "user_cache": user_cache.stats(),
+        "story_cache": story_generator.cache.stats(),
+        "story_coalescing": story_generator.coalescing_stats,
+        "story_providers": story_generator.provider_stats(),
+        "jobs": job_queue.stats(),
+        "thumbnails": thumbnail_cache.stats()
+    }
 
 # Authentication routes
 @app.post("/api/auth/register", response_model=UserResponse)
@@ -198,7 +1078,7 @@ async def register(user: UserCreate):
         )
     
     # Hash password
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     
     # Create user document
     user_doc = {
@@ -208,26 +1088,44 @@ async def register(user: UserCreate):
         "age": user.age,
         "parent_id": user.parent_id,
         "hashed_password": hashed_password,
+        "story_count": 0,
         "created_at": datetime.utcnow(),
         "is_active": True
     }
     
-    # Insert user
-    result = await users_collection.insert_one(user_doc)
+    # Insert user; the unique email index catches a concurrent signup the check above missed
+    try:
+        result = await users_collection.insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     user_doc["_id"] = result.inserted_id
+    await profiles_collection.insert_one(empty_interest_profile(str(result.inserted_id)))
+    await refresh_progress_summary(str(result.inserted_id))
     
     return UserResponse(**convert_mongo_document(user_doc))
 
 @app.post("/api/auth/login", response_model=Token)
 async def login(user_credentials: UserLogin):
     user = await users_collection.find_one({"email": user_credentials.email})
-    if not user or not verify_password(user_credentials.password, user["hashed_password"]):
+    is_valid, new_hash = (False, None)
+    if user:
+        is_valid, new_hash = await verify_password(user_credentials.password, user["hashed_password"])
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Transparently upgrade hashes created with an older cost factor
+    if new_hash:
+        await users_collection.update_one({"_id": user["_id"]}, {"$set": {"hashed_password": new_hash}})
+        user_cache.invalidate(str(user["_id"]))
+        password_hash_stats["rehashed"] += 1
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(user["_id"])}, expires_delta=access_token_expires
@@ -239,50 +1137,363 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     return UserResponse(**convert_mongo_document(current_user))
 
 # Drawing routes
-@app.post("/api/drawings", response_model=DrawingResponse)
-async def create_drawing(drawing: DrawingCreate, current_user: dict = Depends(get_current_user)):
-    drawing_doc = {
+async def build_drawing_document(drawing: DrawingCreate, user_id: str) -> dict:
+    canvas_data, canvas_blobs = await store_canvas_blobs(drawing.canvas_data)
+    now = mongo_now()
+    return {
         "title": drawing.title,
         "description": drawing.description,
-        "canvas_data": drawing.canvas_data,
-        "time_lapse": drawing.time_lapse or [],
+        "canvas_data": canvas_data,
+        "canvas_blobs": canvas_blobs,
+        "canvas_format": CANVAS_FORMAT_VERSION,
+        "time_lapse": pack_time_lapse(drawing.time_lapse),
+        "version": 1,
         "quest_id": drawing.quest_id,
-        "user_id": str(current_user["_id"]),
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
+        "user_id": user_id,
+        "created_at": now,
+        "updated_at": now
     }
+
+@app.post("/api/drawings", response_model=DrawingResponse)
+async def create_drawing(
+    drawing: DrawingCreate,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    drawing_doc = await build_drawing_document(drawing, str(current_user["_id"]))
     
     result = await drawings_collection.insert_one(drawing_doc)
     drawing_doc["_id"] = result.inserted_id
+    # Analyze once the response has been sent, from the packed time-lapse
+    background_tasks.add_task(store_drawing_analysis, dict(drawing_doc))
+    drawing_doc["time_lapse"] = drawing.time_lapse or []
+    await update_interest_profile(drawing_doc["user_id"], [drawing_doc])
     
-    return DrawingResponse(**convert_mongo_document(drawing_doc))
+    drawing_doc = convert_mongo_document(drawing_doc)
+    drawing_doc["canvas_data"] = drawing.canvas_data
+    drawing_doc["canvas_urls"] = {field: canvas_blob_url(drawing_doc["id"], field) for field in drawing_doc.pop("canvas_blobs")}
+    drawing_doc["thumbnail_url"] = thumbnail_url(drawing_doc["id"], drawing_doc["updated_at"])
+    return DrawingResponse(**drawing_doc)
+
+@app.post("/api/drawings/batch", response_model=BatchResponse)
+async def create_drawings_batch(
+    batch: BatchRequest,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    """Create many drawings in one request, with a result per item"""
+    user_id = str(current_user["_id"])
+    results = {}
+    entries = []
+    for index, item in validate_batch_items(DrawingBatchItem, batch.items, results):
+        drawing_doc = await build_drawing_document(item, user_id)
+        if item.idempotency_key is not None:
+            drawing_doc["idempotency_key"] = item.idempotency_key
+        entries.append((index, drawing_doc))
+
+    inserted = await insert_batch(drawings_collection, user_id, entries, results)
+    for _, drawing_doc in inserted:
+        background_tasks.add_task(store_drawing_analysis, dict(drawing_doc))
+    if inserted:
+        await update_interest_profile(user_id, [drawing_doc for _, drawing_doc in inserted])
+    return batch_response(results)
 
 @app.get("/api/drawings", response_model=List[DrawingResponse])
-async def get_user_drawings(current_user: dict = Depends(get_current_user)):
-    drawings = await drawings_collection.find({"user_id": str(current_user["_id"])}).to_list(100)
-    return [DrawingResponse(**convert_mongo_document(drawing)) for drawing in drawings]
+async def get_user_drawings(
+    response: Response,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    drawings = await fetch_page(drawings_collection, {"user_id": str(current_user["_id"])}, limit, cursor, response)
+    return documents_response(DrawingResponse, await asyncio.gather(*map(convert_drawing_document, drawings)), response)
+
+@app.get("/api/drawings/summary", response_model=List[DrawingSummaryResponse])
+async def get_user_drawing_summaries(
+    response: Response,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Lightweight gallery listing without canvas data or time-lapse"""
+    drawings = await fetch_page(
+        drawings_collection, {"user_id": str(current_user["_id"])},
+        limit, cursor, response, DRAWING_SUMMARY_PROJECTION
+    )
+    return documents_response(DrawingSummaryResponse, [convert_drawing_summary(drawing) for drawing in drawings], response)
 
 @app.get("/api/drawings/{drawing_id}", response_model=DrawingResponse)
 async def get_drawing(drawing_id: str, current_user: dict = Depends(get_current_user)):
     drawing = await drawings_collection.find_one({"_id": ObjectId(drawing_id), "user_id": str(current_user["_id"])})
     if not drawing:
         raise HTTPException(status_code=404, detail="Drawing not found")
-    return DrawingResponse(**convert_mongo_document(drawing))
+    return MongoJSONResponse(shape_document(DrawingResponse, await convert_drawing_document(drawing)))
+
+@app.get("/api/drawings/{drawing_id}/thumbnail")
+async def get_drawing_thumbnail(
+    drawing_id: str,
+    v: str,
+    sig: str,
+    size: str = "small",
+    format: str = "webp"
+):
+    """Serve a rendered thumbnail variant; authorized by the signature in the URL"""
+    if size not in THUMBNAIL_SIZES or format not in THUMBNAIL_FORMATS:
+        raise HTTPException(status_code=400, detail="Unknown thumbnail size or format")
+    if not hmac.compare_digest(sig, thumbnail_signature(drawing_id, v)):
+        raise HTTPException(status_code=403, detail="Invalid thumbnail signature")
+
+    media_type = THUMBNAIL_FORMATS[format][1]
+    cache_key = f"{drawing_id}-{v}-{size}-r{RENDERER_VERSION}.{format}"
+    headers = {"ETag": f'"{cache_key}"', "Cache-Control": "private, max-age=31536000, immutable"}
+    data = await thumbnail_cache.get(cache_key)
+    if data is not None:
+        return Response(content=data, media_type=media_type, headers=headers)
+
+    drawing = await drawings_collection.find_one(
+        {"_id": ObjectId(drawing_id)},
+        {
+            "updated_at": 1,
+            "canvas_blobs.paperjs": 1,
+            "canvas_blobs.thumbnail": 1,
+            "canvas_data.paperjs": 1,
+            "canvas_data.thumbnail": 1,
+            "canvas_data.width": 1,
+            "canvas_data.height": 1
+        }
+    )
+    if not drawing:
+        raise HTTPException(status_code=404, detail="Drawing not found")
+    if thumbnail_version(drawing["updated_at"]) != v:
+        # The drawing was saved again since this URL was handed out
+        return RedirectResponse(thumbnail_url(drawing_id, drawing["updated_at"], size, format))
+
+    canvas_data = drawing.get("canvas_data") or {}
+    canvas_size = (canvas_data.get("width") or 0, canvas_data.get("height") or 0)
+    if not all(canvas_size):
+        canvas_size = progress_analyzer.DEFAULT_CANVAS_SIZE
+    paperjs = await read_canvas_field(drawing, "paperjs")
+    image_data = None
+    thumbnail = await read_canvas_field(drawing, "thumbnail")
+    if thumbnail is not None:
+        image_data, _ = encode_canvas_blob("thumbnail", thumbnail)
+
+    loop = asyncio.get_running_loop()
+    data = await loop.run_in_executor(None, build_thumbnail, paperjs, image_data, canvas_size, size, format)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Drawing has no image to thumbnail")
+    await thumbnail_cache.set(cache_key, data)
+    return Response(content=data, media_type=media_type, headers=headers)
+
+@app.get("/api/drawings/{drawing_id}/canvas/{field}")
+async def get_drawing_canvas_blob(
+    drawing_id: str,
+    field: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Serve one canvas payload (paperjs, svg or thumbnail) with ETag and Range support"""
+    if field not in CANVAS_BLOB_FIELDS or not ObjectId.is_valid(drawing_id):
+        raise HTTPException(status_code=404, detail="Canvas data not found")
+    drawing = await drawings_collection.find_one(
+        {"_id": ObjectId(drawing_id), "user_id": str(current_user["_id"])},
+        {f"canvas_blobs.{field}": 1, f"canvas_data.{field}": 1}
+    )
+    if not drawing:
+        raise HTTPException(status_code=404, detail="Drawing not found")
+
+    ref = (drawing.get("canvas_blobs") or {}).get(field)
+    data = None
+    if ref is None:
+        # Drawings saved before the blob store keep their canvas inline
+        value = (drawing.get("canvas_data") or {}).get(field)
+        if value is None:
+            raise HTTPException(status_code=404, detail="Canvas data not found")
+        data, ref = encode_canvas_blob(field, value)
+        ref["digest"] = hashlib.sha256(data).hexdigest()
+        ref["size"] = len(data)
+
+    etag = f'"{ref["digest"]}"'
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "private, no-cache"}
+    # Weak comparison, since compressed responses carry a weak version of the ETag
+    if etag in [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    size = ref["size"]
+    status_code = 200
+    start, end = 0, size - 1
+    range_header = request.headers.get("range")
+    # A Range is only honoured while If-Range (when sent) still matches the current blob
+    if range_header and request.headers.get("if-range", etag) == etag:
+        byte_range = parse_range_header(range_header, size)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    try:
+        if data is None and ref.get("compression"):
+            data = await read_canvas_blob(ref)
+        if data is not None:
+            body = data[start:end + 1]
+        elif status_code == 206:
+            body = await blob_store.read_range(ref["digest"], start, end - start + 1)
+        else:
+            body = await blob_store.get(ref["digest"])
+    except FileNotFoundError:
+        print(f"Canvas blob {ref['digest']} missing for drawing {drawing_id}")
+        raise HTTPException(status_code=404, detail="Canvas data not found")
+    return Response(content=body, status_code=status_code, media_type=ref["content_type"], headers=headers)
+
+async def compact_time_lapse(drawing_id: ObjectId, version: int):
+    """Fold autosaved steps back into the packed time-lapse"""
+    # Appends always bump the version, so matching it means the tail hasn't grown since
+    drawing = await drawings_collection.find_one(
+        {"_id": drawing_id, "version": version},
+        {"time_lapse": 1, "time_lapse_tail": 1}
+    )
+    if not drawing or not drawing.get("time_lapse_tail"):
+        return
+    packed = append_time_lapse(drawing.get("time_lapse"), drawing["time_lapse_tail"])
+    await drawings_collection.update_one(
+        {"_id": drawing_id, "version": version},
+        {"$set": {"time_lapse": packed, "time_lapse_tail": [], "time_lapse_tail_count": 0}}
+    )
+
+@app.patch("/api/drawings/{drawing_id}", response_model=DrawingUpdateResponse)
+async def update_drawing(
+    drawing_id: str,
+    update: DrawingUpdate,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    """Autosave: set only the fields sent and append new time-lapse steps"""
+    return await save_drawing(drawing_id, update.model_dump(exclude_unset=True), background_tasks, current_user)
+
+@app.put("/api/drawings/{drawing_id}", response_model=DrawingUpdateResponse)
+async def replace_drawing(
+    drawing_id: str,
+    drawing: DrawingReplace,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    """Replace a drawing's content; unlike PATCH, fields left out are cleared"""
+    changes = drawing.model_dump()
+    changes["time_lapse"] = changes["time_lapse"] or []
+    if changes["version"] is None:
+        del changes["version"]
+    return await save_drawing(drawing_id, changes, background_tasks, current_user, replace=True)
+
+async def save_drawing(drawing_id: str, changes: dict, background_tasks: BackgroundTasks, current_user: dict, replace: bool = False):
+    expected_version = changes.pop("version", None)
+    append_steps = changes.pop("time_lapse_append", None) or []
+    if not changes and not append_steps:
+        raise HTTPException(status_code=400, detail="No changes to save")
+    if "time_lapse" in changes and append_steps:
+        raise HTTPException(status_code=400, detail="Send either time_lapse or time_lapse_append, not both")
+    if not ObjectId.is_valid(drawing_id):
+        raise HTTPException(status_code=404, detail="Invalid drawing ID format")
+
+    user_id = str(current_user["_id"])
+    now = mongo_now()
+    # The stored analysis covers the drawing as it was; it is recomputed on the next request
+    set_fields = {"updated_at": now}
+    unset_fields = {"analysis": ""}
+    for field in ("title", "description", "quest_id"):
+        if field in changes:
+            set_fields[field] = changes[field]
+
+    if replace:
+        # The whole canvas is replaced, so keys and blobs that weren't sent go away; the
+        # blob files stay until scripts/gc_canvas_blobs.py finds them unreferenced
+        inline, refs = await store_canvas_blobs(changes["canvas_data"])
+        set_fields.update({"canvas_data": inline, "canvas_blobs": refs, "canvas_format": CANVAS_FORMAT_VERSION})
+    elif changes.get("canvas_data"):
+        canvas_data = changes["canvas_data"]
+        _, refs = await store_canvas_blobs(
+            {key: value for key, value in canvas_data.items() if key in CANVAS_BLOB_FIELDS}
+        )
+        for key, value in canvas_data.items():
+            if key in refs:
+                set_fields[f"canvas_blobs.{key}"] = refs[key]
+                unset_fields[f"canvas_data.{key}"] = ""
+            elif value is None:
+                unset_fields[f"canvas_data.{key}"] = ""
+                unset_fields[f"canvas_blobs.{key}"] = ""
+            else:
+                set_fields[f"canvas_data.{key}"] = value
+
+    if "time_lapse" in changes:
+        set_fields.update({
+            "time_lapse": pack_time_lapse(changes["time_lapse"]),
+            "time_lapse_tail": [],
+            "time_lapse_tail_count": 0
+        })
+
+    update_doc = {"$set": set_fields, "$unset": unset_fields, "$inc": {"version": 1}}
+    if append_steps:
+        # Packed columns can't be pushed to, so new steps go to a tail that is compacted later
+        update_doc["$push"] = {"time_lapse_tail": {"$each": append_steps}}
+        update_doc["$inc"]["time_lapse_tail_count"] = len(append_steps)
+
+    query = {"_id": ObjectId(drawing_id), "user_id": user_id}
+    if expected_version is not None:
+        # Drawings from before versioning count as version 0
+        query["version"] = expected_version if expected_version else {"$in": [0, None]}
+    before = await drawings_collection.find_one_and_update(
+        query,
+        update_doc,
+        projection={"title": 1, "description": 1, "version": 1, "time_lapse_tail_count": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        current = await drawings_collection.find_one({"_id": ObjectId(drawing_id), "user_id": user_id}, {"version": 1})
+        if not current:
+            raise HTTPException(status_code=404, detail="Drawing not found")
+        raise HTTPException(
+            status_code=409,
+            detail=f"Drawing was saved elsewhere; current version is {current.get('version', 0)}"
+        )
+
+    version = before.get("version", 0) + 1
+    tail_count = len(append_steps)
+    if "time_lapse" not in changes:
+        tail_count += before.get("time_lapse_tail_count", 0)
+    if tail_count > TIME_LAPSE_TAIL_LIMIT:
+        background_tasks.add_task(compact_time_lapse, ObjectId(drawing_id), version)
+
+    if "title" in changes or "description" in changes:
+        after = {field: changes.get(field, before.get(field)) for field in ("title", "description")}
+        await update_interest_profile(user_id, [before], direction=-1)
+        await update_interest_profile(user_id, [after])
+
+    return DrawingUpdateResponse(
+        id=drawing_id,
+        version=version,
+        thumbnail_url=thumbnail_url(drawing_id, now),
+        updated_at=now
+    )
 
 @app.delete("/api/drawings/{drawing_id}")
 async def delete_drawing(drawing_id: str, current_user: dict = Depends(get_current_user)):
     try:
         # Check if drawing exists and belongs to current user
-        drawing = await drawings_collection.find_one({"_id": ObjectId(drawing_id), "user_id": str(current_user["_id"])})
+        drawing = await drawings_collection.find_one(
+            {"_id": ObjectId(drawing_id), "user_id": str(current_user["_id"])},
+            {"title": 1, "description": 1}
+        )
         if not drawing:
             raise HTTPException(status_code=404, detail="Drawing not found")
         
-        # Delete the drawing
+        # Delete the drawing; its canvas blobs may be shared and are left to scripts/gc_canvas_blobs.py
         result = await drawings_collection.delete_one({"_id": ObjectId(drawing_id), "user_id": str(current_user["_id"])})
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Drawing not found or could not be deleted")
         
+        await update_interest_profile(str(current_user["_id"]), [drawing], direction=-1)
+        
         return {"message": "Drawing deleted successfully", "drawing_id": drawing_id}
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -292,6 +1503,41 @@ async def delete_drawing(drawing_id: str, current_user: dict = Depends(get_curre
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 # Story routes
+async def save_generated_story(story_data: dict, prompt: str, current_user: dict) -> StoryResponse:
+    story_doc = {
+        "title": story_data["title"],
+        "content": json.dumps(story_data["pages"]),
+        "pages": story_data["pages"],
+        "user_prompt": prompt,
+        "themes": story_data.get("themes", []),
+        "art_focus": story_data.get("art_focus", ""),
+        "generated_with": story_data.get("generated_with", "ai"),
+        "user_id": str(current_user["_id"]),
+        "created_at": datetime.utcnow()
+    }
+    
+    result = await stories_collection.insert_one(story_doc)
+    story_doc["_id"] = result.inserted_id
+    await increment_story_count(story_doc["user_id"])
+    
+    return StoryResponse(**convert_mongo_document(story_doc))
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def generate_story_for_user(prompt: str, current_user: dict) -> StoryResponse:
+    user_age = current_user.get("age", 7)
+    
+    # User's interests based on existing drawings
+    interests, _ = await get_user_interest_scores(str(current_user["_id"]))
+    top_interests = [k for k, v in sorted(interests.items(), key=lambda x: x[1], reverse=True)[:3]]
+    
+    # Generate AI story
+    story_data = await story_generator.generate_story(prompt, user_age, top_interests)
+    
+    # Save to database
+    return await save_generated_story(story_data, prompt, current_user)
+
 @app.post("/api/stories/generate", response_model=StoryResponse)
 async def generate_ai_story(
     story_request: dict, 
@@ -303,38 +1549,63 @@ async def generate_ai_story(
         if not prompt:
             raise HTTPException(status_code=400, detail="Story prompt is required")
         
-        user_age = current_user.get("age", 7)
-        
-        # Analyze user's interests based on existing drawings
-        user_drawings = await drawings_collection.find({"user_id": str(current_user["_id"])}).to_list(100)
-        interests = interest_analyzer.analyze_drawing_patterns(user_drawings)
-        top_interests = [k for k, v in sorted(interests.items(), key=lambda x: x[1], reverse=True)[:3]]
-        
-        # Generate AI story
-        story_data = await story_generator.generate_story(prompt, user_age, top_interests)
-        
-        # Save to database
-        story_doc = {
-            "title": story_data["title"],
-            "content": json.dumps(story_data["pages"]),
-            "pages": story_data["pages"],
-            "user_prompt": prompt,
-            "themes": story_data.get("themes", []),
-            "art_focus": story_data.get("art_focus", ""),
-            "generated_with": story_data.get("generated_with", "ai"),
-            "user_id": str(current_user["_id"]),
-            "created_at": datetime.utcnow()
-        }
-        
-        result = await stories_collection.insert_one(story_doc)
-        story_doc["_id"] = result.inserted_id
-        
-        return StoryResponse(**convert_mongo_document(story_doc))
+        return await generate_story_for_user(prompt, current_user)
         
     except Exception as e:
         print(f"Story generation error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate story: {str(e)}")
 
+# Running stream generations; the event loop only keeps weak references to tasks
+story_stream_tasks = set()
+
+async def produce_story_events(prompt: str, user_age: int, interests: List[str], current_user: dict, events: asyncio.Queue):
+    """Generate and save a streamed story, queueing its SSE events and then None"""
+    try:
+        page_number = 0
+        async for event, data in story_generator.stream_story(prompt, user_age, interests):
+            if event == "page":
+                page_number += 1
+                events.put_nowait(sse_event("page", {"page_number": page_number, **data}))
+            else:
+                story = await save_generated_story(data, prompt, current_user)
+                events.put_nowait(sse_event("done", story.model_dump(mode="json")))
+    except Exception as e:
+        print(f"Story streaming error: {e}")
+        events.put_nowait(sse_event("error", {"detail": f"Failed to generate story: {str(e)}"}))
+    finally:
+        events.put_nowait(None)
+
+@app.post("/api/stories/generate/stream")
+async def stream_ai_story(
+    story_request: dict,
+    current_user: dict = Depends(get_current_user)
+):
+    """Generate an AI story, sending each page as a server-sent event as soon as it is ready"""
+    prompt = story_request.get("prompt", "")
+    if not prompt:
+        raise HTTPException(status_code=400, detail="Story prompt is required")
+    
+    user_age = current_user.get("age", 7)
+    interests, _ = await get_user_interest_scores(str(current_user["_id"]))
+    top_interests = [k for k, v in sorted(interests.items(), key=lambda x: x[1], reverse=True)[:3]]
+    
+    # Generated and saved in a task of its own, so the story is kept even if the client
+    # disconnects; the response only relays the events it queues
+    events = asyncio.Queue()
+    task = asyncio.ensure_future(produce_story_events(prompt, user_age, top_interests, current_user, events))
+    story_stream_tasks.add(task)
+    task.add_done_callback(story_stream_tasks.discard)
+    
+    async def event_stream():
+        while (event := await events.get()) is not None:
+            yield event
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/stories", response_model=StoryResponse)
 async def create_story(story: StoryCreate, current_user: dict = Depends(get_current_user)):
     story_doc = {
@@ -348,36 +1619,123 @@ async def create_story(story: StoryCreate, current_user: dict = Depends(get_curr
     
     result = await stories_collection.insert_one(story_doc)
     story_doc["_id"] = result.inserted_id
+    await increment_story_count(story_doc["user_id"])
     
     return StoryResponse(**convert_mongo_document(story_doc))
 
 @app.get("/api/stories", response_model=List[StoryResponse])
-async def get_user_stories(current_user: dict = Depends(get_current_user)):
-    stories = await stories_collection.find({"user_id": str(current_user["_id"])}).to_list(100)
-    return [StoryResponse(**convert_mongo_document(story)) for story in stories]
+async def get_user_stories(
+    response: Response,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    stories = await fetch_page(stories_collection, {"user_id": str(current_user["_id"])}, limit, cursor, response)
+    return documents_response(StoryResponse, [convert_mongo_document(story) for story in stories], response)
 
 # Progress routes
 @app.post("/api/progress", response_model=ProgressResponse)
 async def create_progress(progress: ProgressCreate, current_user: dict = Depends(get_current_user)):
-    progress_doc = {
-        "quest_id": progress.quest_id,
-        "status": progress.status,
-        "completion_percentage": progress.completion_percentage,
-        "badges_earned": progress.badges_earned,
-        "user_id": str(current_user["_id"]),
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
+    """Record progress on a quest, merged into the user's one document for that quest"""
+    user_id = str(current_user["_id"])
+    # The id is chosen here so an insert can be told apart from an update
+    new_id = ObjectId()
+    query = {"user_id": user_id, "quest_id": progress.quest_id}
+    update = progress_update(progress, datetime.utcnow(), new_id)
+    try:
+        progress_doc = await progress_collection.find_one_and_update(
+            query, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Lost an upsert race with another request for the same quest; it exists now
+        del update["$setOnInsert"]["_id"]
+        progress_doc = await progress_collection.find_one_and_update(
+            query, update, return_document=ReturnDocument.AFTER
+        )
     
-    result = await progress_collection.insert_one(progress_doc)
-    progress_doc["_id"] = result.inserted_id
+    if progress_doc["_id"] == new_id or progress.status == "completed":
+        await refresh_progress_summary(user_id)
     
     return ProgressResponse(**convert_mongo_document(progress_doc))
 
+@app.post("/api/progress/batch", response_model=BatchResponse)
+async def create_progress_batch(batch: BatchRequest, current_user: dict = Depends(get_current_user)):
+    """Record many progress updates in one request, with a result per item
+
+    Progress upserts are idempotent, so replaying a batch is safe without keys.
+    """
+    user_id = str(current_user["_id"])
+    results = {}
+    by_quest = OrderedDict()
+    for index, item in validate_batch_items(ProgressCreate, batch.items, results):
+        by_quest.setdefault(item.quest_id, []).append((index, item))
+
+    now = datetime.utcnow()
+    quest_ids = list(by_quest)
+    operations = [
+        UpdateOne(
+            {"user_id": user_id, "quest_id": quest_id},
+            progress_update(merge_progress_items([item for _, item in by_quest[quest_id]]), now),
+            upsert=True
+        )
+        for quest_id in quest_ids
+    ]
+    upserted = {}
+    write_errors = {}
+    if operations:
+        try:
+            result = await progress_collection.bulk_write(operations, ordered=False)
+            upserted = result.upserted_ids
+        except BulkWriteError as e:
+            upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+            write_errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+        ids = {}
+        async for progress in progress_collection.find({"user_id": user_id, "quest_id": {"$in": quest_ids}}, {"quest_id": 1}):
+            ids[progress["quest_id"]] = str(progress["_id"])
+        for position, quest_id in enumerate(quest_ids):
+            for order, (index, _) in enumerate(by_quest[quest_id]):
+                if position in write_errors:
+                    results[index] = BatchItemResult(index=index, status="failed", error=write_errors[position].get("errmsg", "Write failed"))
+                else:
+                    # Later items for a quest update the document the first one created
+                    status_name = "created" if position in upserted and order == 0 else "updated"
+                    results[index] = BatchItemResult(index=index, status=status_name, id=ids.get(quest_id))
+        await refresh_progress_summary(user_id)
+    return batch_response(results)
+
 @app.get("/api/progress", response_model=List[ProgressResponse])
-async def get_user_progress(current_user: dict = Depends(get_current_user)):
-    progress = await progress_collection.find({"user_id": str(current_user["_id"])}).to_list(100)
-    return [ProgressResponse(**convert_mongo_document(p)) for p in progress]
+async def get_user_progress(
+    response: Response,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    progress = await fetch_page(progress_collection, {"user_id": str(current_user["_id"])}, limit, cursor, response)
+    return documents_response(ProgressResponse, [convert_mongo_document(p) for p in progress], response)
+
+# Parent routes
+@app.get("/api/parent/overview", response_model=ParentOverviewResponse)
+async def get_parent_overview(
+    recent: int = Query(4, ge=1, le=MAX_RECENT_DRAWINGS),
+    current_user: dict = Depends(get_current_user)
+):
+    """Counts, quest completion, interests and recent drawings for every linked child"""
+    if current_user.get("user_type") != "parent":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only parent accounts have an overview"
+        )
+    
+    pipeline = children_overview_pipeline(str(current_user["_id"]), recent)
+    children = await users_collection.aggregate(pipeline).to_list(MAX_CHILDREN_PER_PARENT)
+    overviews = await asyncio.gather(*map(build_child_overview, children))
+    return ParentOverviewResponse(
+        children=overviews,
+        total_drawings=sum(child.drawing_count for child in overviews),
+        total_stories=sum(child.story_count for child in overviews),
+        total_completed_quests=sum(child.completed_quests for child in overviews)
+    )
 
 # Quest routes (placeholder for now)
 @app.get("/api/quests")
@@ -410,19 +1768,16 @@ async def get_quests():
 
 # AI-powered analysis and recommendations
 @app.get("/api/ai/interests")
-async def get_user_interests(current_user: dict = Depends(get_current_user)):
+async def get_user_interests(rebuild: bool = False, current_user: dict = Depends(get_current_user)):
     """Get AI-analyzed user interests based on drawing patterns"""
     try:
-        # Get user's drawings
-        user_drawings = await drawings_collection.find({"user_id": str(current_user["_id"])}).to_list(100)
-        
-        # Analyze interests
-        interests = interest_analyzer.analyze_drawing_patterns(user_drawings)
+        # Read interests from the user's running profile; rebuild recounts every drawing
+        interests, drawing_count = await get_user_interest_scores(str(current_user["_id"]), rebuild)
         
         return {
             "interests": interests,
             "top_interests": [k for k, v in sorted(interests.items(), key=lambda x: x[1], reverse=True)[:5]],
-            "total_drawings_analyzed": len(user_drawings)
+            "total_drawings_analyzed": drawing_count
         }
     except Exception as e:
         print(f"Interest analysis error: {e}")
@@ -432,15 +1787,12 @@ async def get_user_interests(current_user: dict = Depends(get_current_user)):
 async def get_personalized_recommendations(current_user: dict = Depends(get_current_user)):
     """Get personalized quest and story recommendations"""
     try:
-        # Get user's drawings and current progress
-        user_drawings = await drawings_collection.find({"user_id": str(current_user["_id"])}).to_list(100)
-        user_progress = await progress_collection.find({"user_id": str(current_user["_id"])}).to_list(100)
-        
-        # Analyze interests
-        interests = interest_analyzer.analyze_drawing_patterns(user_drawings)
+        # Get user's interests and current progress
+        interests, _ = await get_user_interest_scores(str(current_user["_id"]))
+        summary = await get_progress_summary(str(current_user["_id"]))
         
         # Get current quest IDs
-        current_quests = [p["quest_id"] for p in user_progress]
+        current_quests = summary["quest_ids"]
         
         # Generate recommendations
         recommendations = interest_analyzer.get_personalized_recommendations(interests, current_quests)
@@ -454,6 +1806,73 @@ async def get_personalized_recommendations(current_user: dict = Depends(get_curr
         print(f"Recommendation error: {e}")
         return {"recommendations": [], "based_on_interests": [], "total_recommendations": 0}
 
+# Drawing analysis is computed when a drawing is saved and stored with the analyzer version
+ANALYSIS_SOURCE_PROJECTION = {
+    "time_lapse": 1,
+    "time_lapse_tail": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "canvas_data.width": 1,
+    "canvas_data.height": 1
+}
+
+def compute_drawing_analysis(drawing: dict) -> dict:
+    time_lapse = drawing.get("time_lapse", [])
+    if drawing.get("time_lapse_tail"):
+        time_lapse = append_time_lapse(time_lapse, drawing["time_lapse_tail"])
+    created_at = drawing.get("created_at")
+    updated_at = drawing.get("updated_at")
+    
+    drawing_duration = 0
+    if created_at and updated_at:
+        drawing_duration = (updated_at - created_at).total_seconds()
+    
+    canvas_data = drawing.get("canvas_data") or {}
+    canvas_size = None
+    if canvas_data.get("width") and canvas_data.get("height"):
+        canvas_size = (canvas_data["width"], canvas_data["height"])
+    
+    return {
+        "version": progress_analyzer.VERSION,
+        "result": progress_analyzer.analyze_drawing_progress(time_lapse, drawing_duration, canvas_size),
+        "computed_at": datetime.utcnow()
+    }
+
+async def store_drawing_analysis(drawing: dict) -> dict:
+    # CPU-bound, and batch saves queue many of these back to back; keep it off the event loop
+    loop = asyncio.get_running_loop()
+    analysis = await loop.run_in_executor(None, compute_drawing_analysis, drawing)
+    # Skipped if the drawing was saved again meanwhile, so a stale analysis isn't stored
+    await drawings_collection.update_one(
+        {"_id": drawing["_id"], "updated_at": drawing["updated_at"]},
+        {"$set": {"analysis": analysis}}
+    )
+    return analysis
+
+async def analyze_user_drawing(drawing_id: str, user_id: str) -> dict:
+    # Only the stored analysis is read unless it is missing or from an older analyzer
+    drawing = await drawings_collection.find_one(
+        {"_id": ObjectId(drawing_id), "user_id": user_id},
+        {"title": 1, "analysis": 1}
+    )
+    
+    if not drawing:
+        raise HTTPException(status_code=404, detail="Drawing not found")
+    
+    analysis = drawing.get("analysis")
+    if not analysis or analysis.get("version") != progress_analyzer.VERSION:
+        source = await drawings_collection.find_one({"_id": drawing["_id"]}, ANALYSIS_SOURCE_PROJECTION)
+        if not source:
+            raise HTTPException(status_code=404, detail="Drawing not found")
+        analysis = await store_drawing_analysis(source)
+    
+    return {
+        "drawing_id": drawing_id,
+        "analysis": analysis["result"],
+        "drawing_title": drawing.get("title", "Untitled"),
+        "analysis_timestamp": analysis["computed_at"]
+    }
+
 @app.post("/api/ai/analyze-drawing")
 async def analyze_drawing_progress(
     analysis_request: dict,
@@ -465,32 +1884,7 @@ async def analyze_drawing_progress(
         if not drawing_id:
             raise HTTPException(status_code=400, detail="Drawing ID is required")
         
-        # Get drawing data
-        drawing = await drawings_collection.find_one({
-            "_id": ObjectId(drawing_id),
-            "user_id": str(current_user["_id"])
-        })
-        
-        if not drawing:
-            raise HTTPException(status_code=404, detail="Drawing not found")
-        
-        # Analyze drawing progress
-        time_lapse = drawing.get("time_lapse", [])
-        created_at = drawing.get("created_at")
-        updated_at = drawing.get("updated_at")
-        
-        drawing_duration = 0
-        if created_at and updated_at:
-            drawing_duration = (updated_at - created_at).total_seconds()
-        
-        analysis = progress_analyzer.analyze_drawing_progress(time_lapse, drawing_duration)
-        
-        return {
-            "drawing_id": drawing_id,
-            "analysis": analysis,
-            "drawing_title": drawing.get("title", "Untitled"),
-            "analysis_timestamp": datetime.utcnow()
-        }
+        return await analyze_user_drawing(drawing_id, str(current_user["_id"]))
         
     except HTTPException:
         raise
@@ -498,6 +1892,67 @@ async def analyze_drawing_progress(
         print(f"Drawing analysis error: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+# Background jobs
+async def story_generation_job(payload: dict) -> dict:
+    user = await users_collection.find_one({"_id": ObjectId(payload["user_id"])})
+    if user is None:
+        raise PermanentJobError("User not found")
+    story = await generate_story_for_user(payload["prompt"], user)
+    return story.model_dump()
+
+async def drawing_analysis_job(payload: dict) -> dict:
+    if not ObjectId.is_valid(payload["drawing_id"]):
+        raise PermanentJobError("Invalid drawing ID format")
+    try:
+        return await analyze_user_drawing(payload["drawing_id"], payload["user_id"])
+    except HTTPException as e:
+        raise PermanentJobError(e.detail)
+
+# Analysis is quick feedback while drawing, so it goes ahead of queued stories
+job_queue = JobQueue(jobs_collection, workers=JOB_WORKERS)
+job_queue.register(
+    "drawing_analysis", drawing_analysis_job,
+    priority=10, concurrency=int(os.getenv("ANALYSIS_JOB_CONCURRENCY", "4")), max_attempts=2
+)
+job_queue.register(
+    "story_generation", story_generation_job,
+    priority=0, concurrency=int(os.getenv("STORY_JOB_CONCURRENCY", "4")), max_attempts=3
+)
+JOB_REQUIRED_FIELDS = {"story_generation": "prompt", "drawing_analysis": "drawing_id"}
+
+@app.post("/api/jobs", response_model=JobResponse)
+async def submit_job(job: JobCreate, current_user: dict = Depends(get_current_user)):
+    """Queue a story generation or drawing analysis to run in the background"""
+    required = JOB_REQUIRED_FIELDS.get(job.type)
+    if required is None:
+        raise HTTPException(status_code=400, detail=f"Unknown job type: {job.type}")
+    if not job.payload.get(required):
+        raise HTTPException(status_code=400, detail=f"Job payload requires '{required}'")
+    if job.type == "drawing_analysis" and not ObjectId.is_valid(job.payload["drawing_id"]):
+        raise HTTPException(status_code=400, detail="Invalid drawing ID format")
+    
+    payload = {required: job.payload[required], "user_id": str(current_user["_id"])}
+    job_doc = await job_queue.submit(job.type, payload, str(current_user["_id"]))
+    return JobResponse(**convert_mongo_document(job_doc))
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=MAX_JOB_WAIT_SECONDS),
+    current_user: dict = Depends(get_current_user)
+):
+    """Job status; with wait > 0 the request is held until the job finishes or the wait runs out"""
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if wait:
+        job_doc = await job_queue.wait(job_id, str(current_user["_id"]), wait)
+    else:
+        job_doc = await job_queue.get(job_id, str(current_user["_id"]))
+    if not job_doc:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**convert_mongo_document(job_doc))
+
 @app.get("/api/ai/drawing-hints")
 async def get_drawing_hints(
     quest_id: Optional[str] = None,
@@ -506,14 +1961,7 @@ async def get_drawing_hints(
     """Get AI-powered drawing hints and tips"""
     try:
         # Get user's skill level based on completed quests
-        user_progress = await progress_collection.find({"user_id": str(current_user["_id"])}).to_list(100)
-        completed_quests = [p for p in user_progress if p.get("status") == "completed"]
-        
-        skill_level = "beginner"
-        if len(completed_quests) >= 3:
-            skill_level = "intermediate"
-        elif len(completed_quests) >= 6:
-            skill_level = "advanced"
+        skill_level = (await get_progress_summary(str(current_user["_id"])))["skill_level"]
         
         # Generate contextual hints
         hints = []
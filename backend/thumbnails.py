@@ -0,0 +1,288 @@
+import colorsys
+import io
+import json
+import os
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import aiofiles
+import aiofiles.os
+from PIL import Image, ImageColor, ImageDraw
+
+# Bump when rendering changes so cached variants from the old renderer are not served
+RENDERER_VERSION = 1
+THUMBNAIL_SIZES = {
+    "small": (200, 140),
+    "medium": (400, 280),
+    "large": (800, 560)
+}
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "png": ("PNG", "image/png")
+}
+SUPERSAMPLE = 2
+BEZIER_STEPS = 8
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def _multiply(m: Tuple, n: Tuple) -> Tuple:
+    """Affine matrix product m * n, both in paper.js (a, b, c, d, tx, ty) order"""
+    a, b, c, d, tx, ty = m
+    a2, b2, c2, d2, tx2, ty2 = n
+    return (
+        a * a2 + c * b2,
+        b * a2 + d * b2,
+        a * c2 + c * d2,
+        b * c2 + d * d2,
+        a * tx2 + c * ty2 + tx,
+        b * tx2 + d * ty2 + ty
+    )
+
+
+def _apply(m: Tuple, x: float, y: float) -> Tuple[float, float]:
+    a, b, c, d, tx, ty = m
+    return a * x + c * y + tx, b * x + d * y + ty
+
+
+def _parse_color(value: Any, opacity: float) -> Optional[Tuple[int, int, int, int]]:
+    """RGBA tuple for a serialized paper.js color, or None for no paint"""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str):
+            rgb = ImageColor.getrgb(value)[:3]
+            alpha = 1.0
+        elif value and isinstance(value[0], str):
+            kind, components = value[0], list(value[1:])
+            if kind == "gray":
+                rgb = (components[0],) * 3
+                alpha = components[1] if len(components) > 1 else 1.0
+            elif kind in ("hsb", "hsl"):
+                hue = components[0] / 360.0
+                if kind == "hsb":
+                    rgb = colorsys.hsv_to_rgb(hue, components[1], components[2])
+                else:
+                    rgb = colorsys.hls_to_rgb(hue, components[2], components[1])
+                alpha = components[3] if len(components) > 3 else 1.0
+            else:
+                # Gradients and patterns are drawn as a neutral tone
+                rgb, alpha = (0.5, 0.5, 0.5), 1.0
+            rgb = tuple(int(round(channel * 255)) for channel in rgb)
+        else:
+            rgb = tuple(int(round(channel * 255)) for channel in value[:3])
+            alpha = value[3] if len(value) > 3 else 1.0
+    except (ValueError, TypeError, IndexError):
+        return None
+    return (*rgb, int(round(255 * alpha * opacity)))
+
+
+def _segment(segment: Any) -> Tuple[Tuple[float, float], Tuple[float, float], Tuple[float, float]]:
+    """(point, handle_in, handle_out); handles are relative to the point"""
+    if isinstance(segment[0], (int, float)):
+        return (segment[0], segment[1]), (0, 0), (0, 0)
+    point = segment[0]
+    handle_in = segment[1] if len(segment) > 1 else (0, 0)
+    handle_out = segment[2] if len(segment) > 2 else (0, 0)
+    return tuple(point), tuple(handle_in), tuple(handle_out)
+
+
+def _flatten(segments: List, closed: bool) -> List[Tuple[float, float]]:
+    """Polyline through a path's segments with the bezier curves sampled"""
+    parsed = [_segment(segment) for segment in segments]
+    if not parsed:
+        return []
+    points = [parsed[0][0]]
+    pairs = list(zip(parsed, parsed[1:]))
+    if closed and len(parsed) > 1:
+        pairs.append((parsed[-1], parsed[0]))
+    for (p0, _, h0), (p1, h1, _) in pairs:
+        if h0 == (0, 0) and h1 == (0, 0):
+            points.append(p1)
+            continue
+        c0 = (p0[0] + h0[0], p0[1] + h0[1])
+        c1 = (p1[0] + h1[0], p1[1] + h1[1])
+        for step in range(1, BEZIER_STEPS + 1):
+            t = step / BEZIER_STEPS
+            u = 1 - t
+            points.append((
+                u ** 3 * p0[0] + 3 * u * u * t * c0[0] + 3 * u * t * t * c1[0] + t ** 3 * p1[0],
+                u ** 3 * p0[1] + 3 * u * u * t * c0[1] + 3 * u * t * t * c1[1] + t ** 3 * p1[1]
+            ))
+    return points
+
+
+class PaperRenderer:
+    """Draws the subset of paper.js exportJSON output the drawing canvas produces.
+
+    Layers, groups, paths and compound paths are rendered with their stroke and fill;
+    rasters, text and symbols are skipped.
+    """
+
+    def __init__(self, draw: ImageDraw.ImageDraw, scale: float):
+        self.draw = draw
+        self.scale = scale
+
+    def render(self, item: Any, matrix: Tuple = IDENTITY, opacity: float = 1.0):
+        if not isinstance(item, list) or len(item) != 2 or not isinstance(item[0], str):
+            # The top level of a project export is a list of layers
+            if isinstance(item, list):
+                for child in item:
+                    self.render(child, matrix, opacity)
+            return
+
+        kind, props = item
+        if not isinstance(props, dict) or props.get("visible") is False:
+            return
+        if props.get("matrix"):
+            matrix = _multiply(matrix, tuple(props["matrix"]))
+        opacity *= props.get("opacity", 1.0)
+
+        if kind in ("Layer", "Group"):
+            for child in props.get("children", []):
+                self.render(child, matrix, opacity)
+        elif kind == "Path":
+            self._draw_paths([(props.get("segments", []), props.get("closed", False))], matrix, opacity, props)
+        elif kind == "CompoundPath":
+            paths = [
+                (child[1].get("segments", []), child[1].get("closed", False))
+                for child in props.get("children", [])
+                if isinstance(child, list) and len(child) == 2 and isinstance(child[1], dict)
+            ]
+            self._draw_paths(paths, matrix, opacity, props)
+
+    def _draw_paths(self, paths: List, matrix: Tuple, opacity: float, style: Dict):
+        fill = _parse_color(style.get("fillColor"), opacity)
+        stroke = _parse_color(style.get("strokeColor"), opacity)
+        width = max(1, int(round(style.get("strokeWidth", 1) * self.scale)))
+        for segments, closed in paths:
+            points = [
+                (x * self.scale, y * self.scale)
+                for x, y in (_apply(matrix, px, py) for px, py in _flatten(segments, closed))
+            ]
+            if fill and len(points) >= 3:
+                self.draw.polygon(points, fill=fill)
+            if stroke and points:
+                if len(points) > 1:
+                    self.draw.line(points, fill=stroke, width=width, joint="curve")
+                if style.get("strokeCap") == "round" or len(points) == 1:
+                    radius = width / 2
+                    for x, y in (points[0], points[-1]):
+                        self.draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=stroke)
+
+
+def render_paperjs(paperjs: Any, canvas_size: Tuple[int, int], box: Tuple[int, int]) -> Image.Image:
+    """Render a paper.js project export onto a white image that fits inside box"""
+    if isinstance(paperjs, str):
+        paperjs = json.loads(paperjs)
+    canvas_width, canvas_height = canvas_size
+    scale = min(box[0] / canvas_width, box[1] / canvas_height)
+    size = (max(1, round(canvas_width * scale)), max(1, round(canvas_height * scale)))
+
+    # Draw at a multiple of the output size and downsample for anti-aliased edges
+    image = Image.new("RGB", (size[0] * SUPERSAMPLE, size[1] * SUPERSAMPLE), "white")
+    PaperRenderer(ImageDraw.Draw(image, "RGBA"), scale * SUPERSAMPLE).render(paperjs)
+    return image.resize(size, Image.LANCZOS)
+
+
+def resize_image(data: bytes, box: Tuple[int, int]) -> Image.Image:
+    """Decode an uploaded thumbnail and fit it inside box on a white background"""
+    with Image.open(io.BytesIO(data)) as source:
+        source = source.convert("RGBA")
+        source.thumbnail(box, Image.LANCZOS)
+        image = Image.new("RGB", source.size, "white")
+        image.paste(source, mask=source)
+    return image
+
+
+def encode_image(image: Image.Image, image_format: str) -> bytes:
+    output = io.BytesIO()
+    pil_format = THUMBNAIL_FORMATS[image_format][0]
+    if pil_format == "WEBP":
+        image.save(output, pil_format, quality=80, method=4)
+    else:
+        image.save(output, pil_format, optimize=True)
+    return output.getvalue()
+
+
+class ThumbnailCache:
+    """On-disk LRU cache of encoded thumbnail variants, bounded by total size"""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: Optional[OrderedDict] = None
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _load_index(self):
+        """Rebuild the LRU order from the files left by a previous run, oldest access first"""
+        self._entries = OrderedDict()
+        self.total_bytes = 0
+        if not os.path.isdir(self.root):
+            return
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self.total_bytes += size
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if self._entries is None:
+            self._load_index()
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        try:
+            async with aiofiles.open(self._path(key), "rb") as f:
+                data = await f.read()
+        except FileNotFoundError:
+            self.total_bytes -= self._entries.pop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        # The mtime records recency so the order survives restarts
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    async def set(self, key: str, data: bytes):
+        if self._entries is None:
+            self._load_index()
+        await aiofiles.os.makedirs(self.root, exist_ok=True)
+        temp_path = f"{self._path(key)}.{uuid.uuid4().hex}.tmp"
+        async with aiofiles.open(temp_path, "wb") as f:
+            await f.write(data)
+        await aiofiles.os.replace(temp_path, self._path(key))
+
+        self.total_bytes -= self._entries.pop(key, 0)
+        self._entries[key] = len(data)
+        self.total_bytes += len(data)
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                await aiofiles.os.remove(self._path(oldest))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries or {}),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
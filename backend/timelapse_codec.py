@@ -0,0 +1,272 @@
+import json
+import zlib
+from typing import List, Dict, Optional, Any, Union
+import numpy as np
+from bson import Binary
+
+# Packed time-lapse layout (stored in place of the list of step dicts):
+#   timestamps  - first timestamp plus delta-encoded ints
+#   x / y / size - float32 columns, NaN where the step has no value
+#   action / tool / color - uint16 (uint32 if needed) codes into a per-drawing dictionary, 0 = key absent
+#   states - paper.js snapshots, each stored as the bytes that changed since the previous one:
+#            step index, common prefix and suffix lengths, and the zlib compressed middles
+#   extras - zlib compressed JSON of anything that does not fit a column
+TIME_LAPSE_FORMAT = "columnar-v1"
+STRING_COLUMNS = ("action", "tool", "color")
+STEP_KEY_ORDER = ("timestamp", "action", "tool", "color", "size", "point", "state")
+# Column timestamps stay well inside int64 so deltas between them can't overflow either
+TIMESTAMP_LIMIT = 2 ** 62
+
+
+def is_packed_time_lapse(time_lapse: Any) -> bool:
+    return isinstance(time_lapse, dict) and time_lapse.get("format") == TIME_LAPSE_FORMAT
+
+
+class TimeLapseColumns:
+    """Column view of a time-lapse recording, shared by the codec and the analyzers"""
+
+    def __init__(self, count: int, timestamps: np.ndarray, has_timestamp: np.ndarray,
+                 x: np.ndarray, y: np.ndarray, size: np.ndarray,
+                 codes: Dict[str, np.ndarray], dictionaries: Dict[str, List[Optional[str]]],
+                 states: Dict[int, str], extras: Dict[int, Dict]):
+        self.count = count
+        self.timestamps = timestamps
+        self.has_timestamp = has_timestamp
+        self.x = x
+        self.y = y
+        self.size = size
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.states = states
+        self.extras = extras
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def from_steps(cls, steps: List[Dict]) -> "TimeLapseColumns":
+        count = len(steps)
+        timestamps = np.zeros(count, dtype=np.int64)
+        has_timestamp = np.zeros(count, dtype=bool)
+        x = np.full(count, np.nan, dtype=np.float32)
+        y = np.full(count, np.nan, dtype=np.float32)
+        size = np.full(count, np.nan, dtype=np.float32)
+        codes = {column: np.zeros(count, dtype=np.uint32) for column in STRING_COLUMNS}
+        dictionaries = {column: [None] for column in STRING_COLUMNS}
+        lookups = {column: {} for column in STRING_COLUMNS}
+        states = {}
+        extras = {}
+
+        for i, step in enumerate(steps):
+            extra = {}
+            for key, value in step.items():
+                if (key == "timestamp" and isinstance(value, int) and not isinstance(value, bool)
+                        and -TIMESTAMP_LIMIT < value < TIMESTAMP_LIMIT):
+                    timestamps[i] = value
+                    has_timestamp[i] = True
+                elif key in lookups and isinstance(value, str):
+                    lookup = lookups[key]
+                    if value not in lookup:
+                        lookup[value] = len(dictionaries[key])
+                        dictionaries[key].append(value)
+                    codes[key][i] = lookup[value]
+                elif key == "size" and _is_number(value):
+                    size[i] = value
+                elif (key == "point" and isinstance(value, dict) and set(value) == {"x", "y"}
+                      and _is_number(value["x"]) and _is_number(value["y"])):
+                    x[i] = value["x"]
+                    y[i] = value["y"]
+                elif key == "state" and isinstance(value, str):
+                    states[i] = value
+                else:
+                    extra[key] = value
+            if extra:
+                extras[i] = extra
+
+        return cls(count, timestamps, has_timestamp, x, y, size, codes, dictionaries, states, extras)
+
+    @classmethod
+    def from_packed(cls, packed: Dict) -> "TimeLapseColumns":
+        count = packed["count"]
+        deltas = np.frombuffer(packed["dt"], dtype=packed["dt_dtype"]).astype(np.int64)
+        timestamps = np.empty(count, dtype=np.int64)
+        if count:
+            timestamps[0] = packed["t0"]
+            timestamps[1:] = packed["t0"] + np.cumsum(deltas)
+        if packed.get("has_timestamp") is not None:
+            has_timestamp = np.unpackbits(
+                np.frombuffer(packed["has_timestamp"], dtype=np.uint8), count=count
+            ).astype(bool)
+        else:
+            has_timestamp = np.ones(count, dtype=bool)
+        codes = {
+            column: np.frombuffer(packed[column], dtype=packed["code_dtype"][column])
+            for column in STRING_COLUMNS
+        }
+        extras = {}
+        if packed.get("extras"):
+            extras = {int(i): extra for i, extra in json.loads(zlib.decompress(packed["extras"])).items()}
+        return cls(
+            count,
+            timestamps,
+            has_timestamp,
+            np.frombuffer(packed["x"], dtype=np.float32),
+            np.frombuffer(packed["y"], dtype=np.float32),
+            np.frombuffer(packed["size"], dtype=np.float32),
+            codes,
+            packed["dictionary"],
+            _decode_states(packed.get("states")),
+            extras
+        )
+
+    def to_packed(self) -> Dict[str, Any]:
+        # Gaps between pointer events fit in int32 unless the recording spans weeks
+        deltas = np.diff(self.timestamps)
+        dt_dtype = "<i4"
+        if deltas.size and (deltas.min() < np.iinfo(np.int32).min or deltas.max() > np.iinfo(np.int32).max):
+            dt_dtype = "<i8"
+        packed = {
+            "format": TIME_LAPSE_FORMAT,
+            "count": self.count,
+            "t0": int(self.timestamps[0]) if self.count else 0,
+            "dt": Binary(deltas.astype(dt_dtype).tobytes()),
+            "dt_dtype": dt_dtype,
+            "has_timestamp": None,
+            "x": Binary(self.x.astype("<f4").tobytes()),
+            "y": Binary(self.y.astype("<f4").tobytes()),
+            "size": Binary(self.size.astype("<f4").tobytes()),
+            "dictionary": self.dictionaries,
+            "code_dtype": {},
+            "states": None,
+            "extras": None
+        }
+        if not self.has_timestamp.all():
+            packed["has_timestamp"] = Binary(np.packbits(self.has_timestamp).tobytes())
+        for column in STRING_COLUMNS:
+            code_dtype = "<u2" if len(self.dictionaries[column]) <= np.iinfo(np.uint16).max else "<u4"
+            packed["code_dtype"][column] = code_dtype
+            packed[column] = Binary(self.codes[column].astype(code_dtype).tobytes())
+        if self.states:
+            packed["states"] = _encode_states(self.states)
+        if self.extras:
+            packed["extras"] = Binary(zlib.compress(json.dumps(self.extras).encode()))
+        return packed
+
+    def to_steps(self) -> List[Dict]:
+        timestamps = self.timestamps.tolist()
+        xs = self.x.tolist()
+        ys = self.y.tolist()
+        sizes = self.size.tolist()
+        columns = {column: self.codes[column].tolist() for column in STRING_COLUMNS}
+
+        steps = []
+        for i in range(self.count):
+            step = {}
+            if self.has_timestamp[i]:
+                step["timestamp"] = timestamps[i]
+            for column in STRING_COLUMNS:
+                code = columns[column][i]
+                if code:
+                    step[column] = self.dictionaries[column][code]
+            if sizes[i] == sizes[i]:
+                step["size"] = int(sizes[i]) if sizes[i].is_integer() else sizes[i]
+            if xs[i] == xs[i]:
+                step["point"] = {"x": xs[i], "y": ys[i]}
+            if i in self.states:
+                step["state"] = self.states[i]
+            extra = self.extras.get(i)
+            if extra:
+                step.update(extra)
+                step = _ordered_step(step)
+            steps.append(step)
+        return steps
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _common_prefix_length(a: bytes, b: bytes) -> int:
+    length = min(len(a), len(b))
+    if not length:
+        return 0
+    mismatches = np.flatnonzero(np.frombuffer(a, np.uint8, length) != np.frombuffer(b, np.uint8, length))
+    return int(mismatches[0]) if mismatches.size else length
+
+
+def _encode_states(states: Dict[int, str]) -> Dict[str, Binary]:
+    """Delta-encode snapshots against their predecessor.
+
+    Each paper.js export repeats the whole project, so the stroke a snapshot adds is a small
+    middle section between a long shared prefix and suffix. Storing only that keeps the
+    recording linear in what was drawn instead of quadratic.
+    """
+    indices, prefixes, suffixes, lengths, middles = [], [], [], [], []
+    previous = b""
+    for index in sorted(states):
+        current = states[index].encode("utf-8")
+        prefix = _common_prefix_length(previous, current)
+        # Measured on what follows the prefix so the two never overlap
+        suffix = _common_prefix_length(previous[prefix:][::-1], current[prefix:][::-1])
+        middle = current[prefix:len(current) - suffix]
+        indices.append(index)
+        prefixes.append(prefix)
+        suffixes.append(suffix)
+        lengths.append(len(middle))
+        middles.append(middle)
+        previous = current
+    return {
+        "index": Binary(np.array(indices, dtype="<u4").tobytes()),
+        "prefix": Binary(np.array(prefixes, dtype="<u4").tobytes()),
+        "suffix": Binary(np.array(suffixes, dtype="<u4").tobytes()),
+        "length": Binary(np.array(lengths, dtype="<u4").tobytes()),
+        "data": Binary(zlib.compress(b"".join(middles)))
+    }
+
+
+def _decode_states(packed: Optional[Dict[str, Binary]]) -> Dict[int, str]:
+    if not packed:
+        return {}
+    columns = [np.frombuffer(packed[key], dtype="<u4").tolist() for key in ("index", "prefix", "suffix", "length")]
+    data = zlib.decompress(packed["data"])
+    states = {}
+    previous = b""
+    offset = 0
+    for index, prefix, suffix, length in zip(*columns):
+        current = previous[:prefix] + data[offset:offset + length] + previous[len(previous) - suffix:]
+        offset += length
+        states[index] = current.decode("utf-8")
+        previous = current
+    return states
+
+
+def _ordered_step(step: Dict) -> Dict:
+    ordered = {key: step[key] for key in STEP_KEY_ORDER if key in step}
+    ordered.update((key, value) for key, value in step.items() if key not in ordered)
+    return ordered
+
+
+def pack_time_lapse(steps: Optional[List[Dict]]) -> Union[Dict[str, Any], List]:
+    """Pack a list of time-lapse steps for storage; empty recordings stay an empty list"""
+    if not steps:
+        return []
+    return TimeLapseColumns.from_steps(steps).to_packed()
+
+
+def unpack_time_lapse(time_lapse: Any) -> List[Dict]:
+    """Decode a stored time-lapse; legacy documents are already a list of steps"""
+    if is_packed_time_lapse(time_lapse):
+        return TimeLapseColumns.from_packed(time_lapse).to_steps()
+    return time_lapse or []
+
+
+def append_time_lapse(time_lapse: Any, steps: Optional[List[Dict]]) -> Union[Dict[str, Any], List]:
+    """Pack a stored time-lapse (packed or legacy) with more steps added to the end"""
+    return pack_time_lapse(unpack_time_lapse(time_lapse) + list(steps or []))
+
+
+def time_lapse_columns(time_lapse: Any) -> TimeLapseColumns:
+    """Column view of either the packed or the legacy list format"""
+    if is_packed_time_lapse(time_lapse):
+        return TimeLapseColumns.from_packed(time_lapse)
+    return TimeLapseColumns.from_steps(time_lapse or [])
@@ -1,9 +1,40 @@
 import requests
 import sys
+import time
 import uuid
 import json
 from datetime import datetime
 
+def record_strokes(stroke_count, moves_per_stroke=20, start_time=1700000000000):
+    """Time-lapse steps shaped like DrawingCanvas.js records them: a "start" step with the
+    tool and first point, sampled "move" steps, and a "stop" step with the paper.js export"""
+    steps = []
+    paths = []
+    now = start_time
+    for stroke in range(stroke_count):
+        origin_x, origin_y = 40 + (stroke * 37) % 700, 30 + (stroke * 53) % 500
+        points = [(origin_x + i * 4.5, origin_y + (i % 7) * 3.25) for i in range(moves_per_stroke + 1)]
+        steps.append({
+            "timestamp": now, "action": "start", "tool": "pencil", "color": "#8B4513", "size": 5,
+            "point": {"x": points[0][0], "y": points[0][1]}
+        })
+        for x, y in points[1:]:
+            now += 30
+            steps.append({"timestamp": now, "action": "move", "point": {"x": x, "y": y}})
+        # simplify() leaves a few curve segments with handles
+        segments = [[[x, y], [-1.52, 0.73], [1.52, -0.73]] for x, y in points[::5]]
+        paths.append(["Path", {
+            "applyMatrix": True, "segments": segments, "strokeColor": [0.545, 0.271, 0.075],
+            "strokeWidth": 5, "strokeCap": "round", "strokeJoin": "round"
+        }])
+        now += 400
+        steps.append({
+            "timestamp": now, "action": "stop",
+            "state": json.dumps([["Layer", {"applyMatrix": True, "children": paths}]], separators=(",", ":"))
+        })
+        now += 1500
+    return steps
+
 class DrawATaleAPITester:
     def __init__(self, base_url="https://0ea8cde4-993b-452f-8956-b2ca7c1533b1.preview.emergentagent.com/api"):
         self.base_url = base_url
@@ -12,13 +43,16 @@ class DrawATaleAPITester:
         self.tests_passed = 0
         self.user_data = None
         self.drawing_id = None
+        self.last_response = None
 
-    def run_test(self, name, method, endpoint, expected_status, data=None):
+    def run_test(self, name, method, endpoint, expected_status, data=None, headers=None):
         """Run a single API test"""
         url = f"{self.base_url}/{endpoint}"
+        extra_headers = headers or {}
         headers = {'Content-Type': 'application/json'}
         if self.token:
             headers['Authorization'] = f'Bearer {self.token}'
+        headers.update(extra_headers)
 
         self.tests_run += 1
         print(f"\n🔍 Testing {name}...")
@@ -28,8 +62,13 @@ class DrawATaleAPITester:
                 response = requests.get(url, headers=headers)
             elif method == 'POST':
                 response = requests.post(url, json=data, headers=headers)
+            elif method == 'PATCH':
+                response = requests.patch(url, json=data, headers=headers)
+            elif method == 'PUT':
+                response = requests.put(url, json=data, headers=headers)
             elif method == 'DELETE':
                 response = requests.delete(url, headers=headers)
+            self.last_response = response
 
             success = response.status_code == expected_status
             if success:
@@ -51,6 +90,16 @@ class DrawATaleAPITester:
             print(f"❌ Failed - Error: {str(e)}")
             return False, {}
 
+    def check(self, name, condition, detail=""):
+        """Record an assertion about a response as its own test"""
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name} {detail}".rstrip())
+        return bool(condition)
+
     def test_health_check(self):
         """Test API health endpoint"""
         return self.run_test(
@@ -201,6 +250,28 @@ class DrawATaleAPITester:
         
         return success, response
         
+    def test_get_drawing_summaries(self):
+        """Test the lightweight gallery listing"""
+        if not self.token:
+            print("❌ Cannot get drawing summaries without token")
+            return False, {}
+            
+        success, response = self.run_test(
+            "Get Drawing Summaries",
+            "GET",
+            "drawings/summary",
+            200
+        )
+        
+        if success:
+            print(f"✅ Retrieved {len(response)} drawing summaries")
+            for drawing in response:
+                if 'canvas_data' in drawing or 'time_lapse' in drawing:
+                    print(f"❌ Summary for {drawing['id']} contains heavy fields")
+                    success = False
+        
+        return success, response
+        
     def test_get_drawing(self):
         """Test getting a specific drawing"""
         if not self.token or not self.drawing_id:
@@ -288,6 +359,620 @@ class DrawATaleAPITester:
         
         return success, response
 
+    def test_signed_thumbnails(self):
+        """Test that thumbnail URLs load without a token and only with a valid signature"""
+        if not self.token:
+            print("❌ Cannot test thumbnails without token")
+            return False, {}
+        
+        success, drawing = self.run_test("Create Drawing For Thumbnail", "POST", "drawings", 200, data={
+            "title": "Thumbnail drawing",
+            "canvas_data": {
+                "paperjs": "[\"Path\",{\"segments\":[[100,100],[150,100],[150,150],[100,150]],\"closed\":true,\"fillColor\":[0,0,0]}]",
+                "width": 800,
+                "height": 600
+            }
+        })
+        url = drawing.get("thumbnail_url") or ""
+        success = self.check("Drawing has a signed thumbnail URL", url.startswith("/api/") and "sig=" in url) and success
+        if not success:
+            return False, {}
+        endpoint = url[len("/api/"):]
+        
+        # Signed URLs are meant for <img> tags, so no Authorization header is sent
+        saved_token = self.token
+        self.token = None
+        try:
+            image_ok, _ = self.run_test("Load Thumbnail Without Token", "GET", endpoint, 200)
+            image = self.last_response
+            success = self.check(
+                "Thumbnail is a cacheable WebP image",
+                image_ok and image.headers.get("Content-Type") == "image/webp"
+                and image.content[:4] == b"RIFF" and "immutable" in image.headers.get("Cache-Control", "")
+            ) and success
+            png_ok, _ = self.run_test("Load PNG Thumbnail", "GET", endpoint.replace("format=webp", "format=png"), 200)
+            success = self.check("PNG variant is a PNG", png_ok and self.last_response.content[:4] == b"\x89PNG") and success
+            
+            signature = endpoint.split("sig=")[1].split("&")[0]
+            forged = "0" * len(signature)
+            checks = [
+                self.run_test("Reject Forged Signature", "GET", endpoint.replace(signature, forged), 403)[0],
+                self.run_test("Reject Signature For Another Drawing", "GET", endpoint.replace(drawing["id"], "0" * 24), 403)[0],
+                self.run_test("Reject Unknown Thumbnail Size", "GET", endpoint.replace("size=small", "size=huge"), 400)[0],
+                self.run_test("Require Signature", "GET", endpoint.split("&sig=")[0], 422)[0]
+            ]
+        finally:
+            self.token = saved_token
+        return success and all(checks), drawing
+
+    def test_autosave(self):
+        """Test PATCH autosave with time-lapse append and version checks, and PUT replacement"""
+        if not self.token:
+            print("❌ Cannot test autosave without token")
+            return False, {}
+        
+        steps = [
+            {"timestamp": 1700000000000 + i * 100, "action": "draw", "tool": "pencil", "color": "#000000", "size": 3, "point": {"x": i, "y": i}}
+            for i in range(6)
+        ]
+        success, drawing = self.run_test("Create Drawing For Autosave", "POST", "drawings", 200, data={
+            "title": "Autosave drawing",
+            "description": "a rocket to the moon",
+            "quest_id": "quest_1",
+            "canvas_data": {
+                "paperjs": "[\"Path\",{\"segments\":[[10,10],[50,10],[50,50]],\"closed\":true,\"fillColor\":[0,0,0]}]",
+                "width": 800,
+                "height": 600
+            },
+            "time_lapse": steps[:3]
+        })
+        drawing_id = drawing.get("id")
+        success = self.check("New drawing starts at version 1", drawing.get("version") == 1) and success
+        if not drawing_id:
+            return False, {}
+        
+        # PATCH sets only what is sent and appends the new steps
+        patch_ok, saved = self.run_test("Autosave With Appended Steps", "PATCH", f"drawings/{drawing_id}", 200, data={
+            "version": 1, "title": "Autosaved drawing", "time_lapse_append": steps[3:]
+        })
+        success = self.check("Autosave bumps the version", patch_ok and saved.get("version") == 2) and success
+        _, current = self.run_test("Get Autosaved Drawing", "GET", f"drawings/{drawing_id}", 200)
+        success = self.check(
+            "PATCH keeps fields that weren't sent",
+            current.get("title") == "Autosaved drawing" and current.get("description") == "a rocket to the moon"
+            and current.get("quest_id") == "quest_1" and "paperjs" in current.get("canvas_data", {})
+        ) and success
+        success = self.check(
+            "Appended steps follow the saved ones",
+            [step["point"]["x"] for step in current.get("time_lapse", [])] == [0, 1, 2, 3, 4, 5],
+            str(current.get("time_lapse"))
+        ) and success
+        
+        # The thumbnail URL handed out before the save redirects to the new version
+        stale_ok, _ = self.run_test("Follow Stale Thumbnail URL", "GET", drawing["thumbnail_url"][len("/api/"):], 200)
+        success = self.check("Stale thumbnail URL was redirected", stale_ok and bool(self.last_response.history)) and success
+        
+        checks = [
+            self.run_test("Reject Stale Version", "PATCH", f"drawings/{drawing_id}", 409, data={"version": 1, "title": "Lost update"})[0],
+            self.run_test("Reject Empty Autosave", "PATCH", f"drawings/{drawing_id}", 400, data={"version": 2})[0],
+            self.run_test("Reject Replace And Append Together", "PATCH", f"drawings/{drawing_id}", 400, data={
+                "time_lapse": steps, "time_lapse_append": steps
+            })[0],
+            self.run_test("Autosave Unknown Drawing", "PATCH", f"drawings/{'0' * 24}", 404, data={"title": "Nobody"})[0],
+            self.run_test("Reject Null Title", "PATCH", f"drawings/{drawing_id}", 422, data={"version": 2, "title": None})[0],
+            self.run_test("Reject Null Canvas", "PATCH", f"drawings/{drawing_id}", 422, data={"version": 2, "canvas_data": None})[0]
+        ]
+        _, unchanged = self.run_test("Get Drawing After Conflict", "GET", f"drawings/{drawing_id}", 200)
+        success = self.check("Conflicting save changed nothing", unchanged.get("title") == "Autosaved drawing") and success
+        
+        # PUT replaces the drawing: fields left out are cleared
+        put_ok, replaced = self.run_test("Replace Drawing", "PUT", f"drawings/{drawing_id}", 200, data={
+            "version": 2, "title": "Replaced drawing", "canvas_data": {"width": 400, "height": 300}
+        })
+        success = self.check("Replacement bumps the version", put_ok and replaced.get("version") == 3) and success
+        _, current = self.run_test("Get Replaced Drawing", "GET", f"drawings/{drawing_id}", 200)
+        success = self.check(
+            "PUT clears fields that weren't sent",
+            current.get("title") == "Replaced drawing" and current.get("description") is None
+            and current.get("quest_id") is None and current.get("time_lapse") == []
+            and current.get("canvas_data") == {"width": 400, "height": 300} and not current.get("canvas_urls"),
+            str(current)
+        ) and success
+        checks.append(self.run_test("Reject Partial PUT", "PUT", f"drawings/{drawing_id}", 422, data={"title": "No canvas"})[0])
+        checks.append(self.run_test("Reject Stale PUT", "PUT", f"drawings/{drawing_id}", 409, data={
+            "version": 2, "title": "Too late", "canvas_data": {}
+        })[0])
+        return success and all(checks), current
+
+    def test_batch_replay(self):
+        """Test that replaying a batch upload with idempotency keys creates nothing twice"""
+        if not self.token:
+            print("❌ Cannot test batch uploads without token")
+            return False, {}
+        
+        run = uuid.uuid4().hex[:8]
+        items = [
+            {"title": f"Offline drawing {run}-{i}", "canvas_data": {}, "idempotency_key": f"{run}-{i}"}
+            for i in range(3)
+        ]
+        # A non-object item is reported on its own instead of failing the batch
+        success, first = self.run_test("Upload Drawing Batch", "POST", "drawings/batch", 200, data={"items": items + [5]})
+        statuses = [result["status"] for result in first.get("results", [])]
+        success = self.check(
+            "Batch creates each drawing and flags the bad item",
+            statuses == ["created", "created", "created", "invalid"] and first.get("created") == 3 and first.get("failed") == 1,
+            str(statuses)
+        ) and success
+        
+        replay_ok, replay = self.run_test("Replay Drawing Batch", "POST", "drawings/batch", 200, data={"items": items})
+        success = self.check(
+            "Replay reports duplicates of the same drawings",
+            replay_ok and replay.get("created") == 0 and replay.get("duplicates") == 3
+            and [result["id"] for result in replay["results"]] == [result["id"] for result in first["results"][:3]],
+            str(replay)
+        ) and success
+        
+        _, summaries = self.run_test("List Drawings After Replay", "GET", "drawings/summary?limit=100", 200)
+        titles = [drawing["title"] for drawing in summaries]
+        success = self.check(
+            "Each batch drawing exists once",
+            all(titles.count(item["title"]) == 1 for item in items)
+        ) and success
+        
+        # Two updates to one quest are merged into one progress document
+        quest = f"quest_{run}"
+        progress_ok, progress = self.run_test("Upload Progress Batch", "POST", "progress/batch", 200, data={"items": [
+            {"quest_id": quest, "completion_percentage": 40},
+            {"quest_id": quest, "status": "completed", "completion_percentage": 100}
+        ]})
+        results = progress.get("results", [])
+        success = self.check(
+            "Merged quest updates report created then updated",
+            progress_ok and [result["status"] for result in results] == ["created", "updated"]
+            and results[0]["id"] == results[1]["id"],
+            str(results)
+        ) and success
+        
+        empty_ok, _ = self.run_test("Reject Empty Batch", "POST", "drawings/batch", 422, data={"items": []})
+        return success and empty_ok, replay
+
+    def test_keyset_pagination(self):
+        """Test that listings page with X-Next-Cursor without repeating or skipping items"""
+        if not self.token:
+            print("❌ Cannot test pagination without token")
+            return False, {}
+        
+        # Enough drawings for at least two pages of two
+        for i in range(3):
+            self.run_test("Create Drawing For Paging", "POST", "drawings", 200, data={
+                "title": f"Paging drawing {i}", "canvas_data": {}
+            })
+        
+        success, first_page = self.run_test("Get First Summary Page", "GET", "drawings/summary?limit=2", 200)
+        cursor = self.last_response.headers.get("X-Next-Cursor")
+        success = self.check("First page holds two drawings and a cursor", len(first_page) == 2 and cursor) and success
+        if not cursor:
+            return False, {}
+        
+        page_ok, second_page = self.run_test("Get Second Summary Page", "GET", f"drawings/summary?limit=2&cursor={cursor}", 200)
+        first_ids = [drawing["id"] for drawing in first_page]
+        second_ids = [drawing["id"] for drawing in second_page]
+        success = self.check(
+            "Second page continues after the first",
+            page_ok and second_ids and not set(first_ids) & set(second_ids)
+            and second_page[0]["created_at"] <= first_page[-1]["created_at"]
+        ) and success
+        
+        bad_ok, _ = self.run_test("Reject Invalid Cursor", "GET", "drawings/summary?cursor=not-a-cursor", 400)
+        limit_ok, _ = self.run_test("Reject Oversized Page", "GET", "drawings?limit=1000", 422)
+        stories_ok, _ = self.run_test("Get Story Page", "GET", "stories?limit=1", 200)
+        progress_ok, _ = self.run_test("Get Progress Page", "GET", "progress?limit=1", 200)
+        return success and bad_ok and limit_ok and stories_ok and progress_ok, second_page
+
+    def test_story_streaming(self):
+        """Test that story generation streams pages as server-sent events, then the saved story"""
+        if not self.token:
+            print("❌ Cannot test story streaming without token")
+            return False, {}
+        
+        success, _ = self.run_test("Stream Story", "POST", "stories/generate/stream", 200, data={
+            "prompt": "a dragon who learns to paint"
+        })
+        if not success:
+            return False, {}
+        
+        response = self.last_response
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+            if "event" in fields:
+                events.append((fields["event"], json.loads(fields.get("data", "null"))))
+        names = [event for event, _ in events]
+        done = events[-1][1] if events else {}
+        
+        success = self.check(
+            "Stream is text/event-stream", response.headers.get("Content-Type", "").startswith("text/event-stream")
+        )
+        success = self.check(
+            "Pages arrive before the finished story",
+            names and names[-1] == "done" and names[:-1] and all(name == "page" for name in names[:-1]),
+            str(names)
+        ) and success
+        success = self.check(
+            "Page events are numbered in order",
+            [data["page_number"] for _, data in events[:-1]] == list(range(1, len(events)))
+        ) and success
+        success = self.check("Finished story was saved", bool(done.get("id")) and done.get("pages")) and success
+        
+        empty_ok, _ = self.run_test("Reject Empty Stream Prompt", "POST", "stories/generate/stream", 400, data={"prompt": ""})
+        return success and empty_ok, done
+
+    def test_story_stream_disconnect(self):
+        """Test that a streamed story is still saved when the client leaves after the first page"""
+        if not self.token:
+            print("❌ Cannot test story streaming without token")
+            return False, {}
+        
+        # A prompt nobody has used, so the story isn't served whole from the cache
+        prompt = f"a lighthouse keeper who paints the sea {uuid.uuid4().hex[:8]}"
+        headers = {"Authorization": f"Bearer {self.token}"}
+        first_event = None
+        try:
+            with requests.post(f"{self.base_url}/stories/generate/stream", json={"prompt": prompt}, headers=headers, stream=True, timeout=60) as response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event: "):
+                        first_event = line[len("event: "):]
+                        break
+        except Exception as e:
+            print(f"Stream request error: {e}")
+        success = self.check("First event is a page", first_event == "page", str(first_event))
+        
+        # The connection is closed now; generation and saving carry on without it
+        saved = None
+        deadline = time.time() + 60
+        while saved is None and time.time() < deadline:
+            stories = requests.get(f"{self.base_url}/stories", headers=headers).json()
+            saved = next((story for story in stories if story.get("user_prompt") == prompt), None)
+            if saved is None:
+                time.sleep(1)
+        success = self.check(
+            "Story is saved after the client disconnects", saved is not None and len(saved.get("pages", [])) == 3
+        ) and success
+        return success, saved or {}
+
+    def test_story_provider_failover(self):
+        """Test failover, the circuit breaker and hedging in-process against local fake providers"""
+        import asyncio
+        import os
+        import time
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+        from ai_services import AIStoryGenerator
+        
+        story_json = json.dumps({
+            "title": "The Fake Provider",
+            "pages": [{"content": f"Page {i}", "drawing_prompt": "Draw it"} for i in range(1, 4)]
+        })
+        calls = {"broken": 0, "slow": 0, "backup": 0, "stuck": 0}
+        
+        async def broken(system_prompt, user_prompt):
+            calls["broken"] += 1
+            raise RuntimeError("provider is down")
+        
+        async def slow(system_prompt, user_prompt):
+            calls["slow"] += 1
+            await asyncio.sleep(2)
+            return json.loads(story_json)
+        
+        async def backup(system_prompt, user_prompt):
+            calls["backup"] += 1
+            return json.loads(story_json)
+        
+        async def stream_stuck(system_prompt, user_prompt):
+            calls["stuck"] += 1
+            yield story_json[:20]
+            await asyncio.sleep(10)
+            yield story_json[20:]
+        
+        async def stream_backup(system_prompt, user_prompt):
+            for i in range(0, len(story_json), 16):
+                await asyncio.sleep(0)
+                yield story_json[i:i + 16]
+        
+        def make_generator(providers, **settings):
+            # Without API keys the generator starts with no providers but the fakes
+            os.environ.pop("OPENAI_API_KEY", None)
+            os.environ.pop("ANTHROPIC_API_KEY", None)
+            generator = AIStoryGenerator()
+            for attribute, value in settings.items():
+                setattr(generator, attribute, value)
+            for name, generate, stream, timeout in providers:
+                generator.register_provider(name, generate, stream, timeout)
+            return generator
+        
+        async def run():
+            results = {}
+            generator = make_generator([("broken", broken, None, 1), ("backup", backup, None, 1)], circuit_failure_threshold=2)
+            stories = [await generator.generate_story(f"failover story {i}") for i in range(4)]
+            results["failover"] = all(story.get("provider") == "backup" for story in stories)
+            results["circuit"] = calls["broken"] == 2 and generator.provider_stats()["broken"]["state"] == "open"
+            
+            generator = make_generator(
+                [("slow", slow, None, 5), ("backup", backup, None, 5)],
+                hedging_enabled=True, default_hedge_delay=0.05
+            )
+            started = time.monotonic()
+            story = await generator.generate_story("hedged story")
+            results["hedge"] = story.get("provider") == "backup" and time.monotonic() - started < 1
+            
+            generator = make_generator(
+                [("stuck", broken, stream_stuck, 0.2), ("backup", backup, stream_backup, 1)]
+            )
+            events = [event async for event in generator.stream_story("streamed failover story")]
+            results["stream"] = (
+                calls["stuck"] == 1 and events[-1][0] == "story" and events[-1][1].get("provider") == "backup"
+                and [page["content"] for event, page in events if event == "page"] == ["Page 1", "Page 2", "Page 3"]
+            )
+            return results
+        
+        results = asyncio.run(run())
+        success = self.check("Failed provider fails over to the next one", results["failover"])
+        success = self.check("Circuit opens after repeated failures and skips the provider", results["circuit"], str(calls)) and success
+        success = self.check("Slow provider is hedged with the next one", results["hedge"]) and success
+        success = self.check("Stuck stream times out and fails over", results["stream"]) and success
+        return success, results
+
+    def test_stroke_metrics(self):
+        """Test stroke metrics in-process on a recording shaped like the canvas page's"""
+        import os
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+        from ai_services import DrawingProgressAnalyzer
+        from timelapse_codec import pack_time_lapse
+        
+        steps = record_strokes(3, moves_per_stroke=10)
+        analysis = DrawingProgressAnalyzer().analyze_drawing_progress(steps, 60, (800, 600))
+        metrics = analysis["stroke_metrics"]
+        # Each stroke moves 9 times by (4.5, 3.25) and once by (4.5, -19.5)
+        expected_length = 3 * (9 * (4.5 ** 2 + 3.25 ** 2) ** 0.5 + (4.5 ** 2 + 19.5 ** 2) ** 0.5)
+        
+        success = self.check("Moves don't count as actions", analysis["total_actions"] == 6, str(analysis["total_actions"]))
+        success = self.check("Tools are counted per stroke", analysis["tools_used"] == {"pencil": 3, "unknown": 3}, str(analysis["tools_used"])) and success
+        success = self.check("One stroke per start step", metrics["stroke_count"] == 3, str(metrics)) and success
+        success = self.check(
+            "Stroke length follows the recorded moves",
+            abs(metrics["stroke_length"]["total"] - expected_length) < 0.1,
+            f"{metrics['stroke_length']} vs {expected_length:.2f}"
+        ) and success
+        success = self.check("Speeds come from timed moves", metrics["speed_percentiles"]["p50"] > 0, str(metrics)) and success
+        success = self.check(
+            "Bounding box spans the whole strokes",
+            metrics["bounding_box"]["width"] > 45 and metrics["bounding_box_coverage"] > 0,
+            str(metrics["bounding_box"])
+        ) and success
+        
+        packed_analysis = DrawingProgressAnalyzer().analyze_drawing_progress(pack_time_lapse(steps), 60, (800, 600))
+        success = self.check("Packed recordings analyze the same", packed_analysis == analysis) and success
+        return success, analysis
+
+    def test_time_lapse_packing(self):
+        """Test in-process that packing a canvas-shaped recording round-trips and shrinks it"""
+        import os
+        import zlib
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+        import bson
+        from timelapse_codec import pack_time_lapse, unpack_time_lapse
+        
+        # Every stop step carries the whole project, so raw size grows with the square of the strokes
+        steps = record_strokes(150)
+        packed = pack_time_lapse(steps)
+        raw_size = len(bson.encode({"time_lapse": steps}))
+        packed_size = len(bson.encode(packed))
+        states_size = len(bson.encode({"states": packed["states"]}))
+        # What the snapshots took when they went into the zlib compressed extras as one JSON blob
+        extras_size = len(zlib.compress(json.dumps(
+            {i: {"state": step["state"]} for i, step in enumerate(steps) if "state" in step}
+        ).encode()))
+        print(f"Time-lapse: {raw_size / 1024:.1f} KiB as steps, {packed_size / 1024:.1f} KiB packed "
+              f"(snapshots {states_size / 1024:.1f} KiB, {extras_size / 1024:.1f} KiB as extras)")
+        
+        success = self.check("Packed recording round-trips", unpack_time_lapse(packed) == steps)
+        success = self.check("Snapshots aren't stored as extras", packed["extras"] is None) and success
+        success = self.check(
+            "Packed recording is at least 20x smaller", packed_size * 20 < raw_size, f"{packed_size} vs {raw_size}"
+        ) and success
+        success = self.check(
+            "Delta-encoded snapshots beat compressing them together",
+            states_size * 10 < extras_size, f"{states_size} vs {extras_size}"
+        ) and success
+        return success, {"raw": raw_size, "packed": packed_size, "states": states_size, "extras": extras_size}
+
+    def test_job_lifecycle(self):
+        """Test that background jobs are queued, run and report their result or failure"""
+        if not self.token:
+            print("❌ Cannot test jobs without token")
+            return False, {}
+        
+        _, drawing = self.run_test("Create Drawing For Analysis Job", "POST", "drawings", 200, data={
+            "title": "Job drawing",
+            "canvas_data": {},
+            "time_lapse": record_strokes(2, moves_per_stroke=4)
+        })
+        success, job = self.run_test("Submit Analysis Job", "POST", "jobs", 200, data={
+            "type": "drawing_analysis", "payload": {"drawing_id": drawing.get("id")}
+        })
+        success = self.check("Job starts queued", job.get("status") == "queued" and job.get("attempts") == 0) and success
+        
+        _, finished = self.run_test("Wait For Analysis Job", "GET", f"jobs/{job.get('id')}?wait=20", 200)
+        success = self.check(
+            "Analysis job completes with a result",
+            finished.get("status") == "completed" and finished.get("result", {}).get("drawing_id") == drawing.get("id"),
+            str(finished)
+        ) and success
+        
+        _, story_job = self.run_test("Submit Story Job", "POST", "jobs", 200, data={
+            "type": "story_generation", "payload": {"prompt": "a robot who plants a garden"}
+        })
+        _, story_finished = self.run_test("Wait For Story Job", "GET", f"jobs/{story_job.get('id')}?wait=30", 200)
+        success = self.check(
+            "Story job completes with a story",
+            story_finished.get("status") == "completed" and story_finished.get("result", {}).get("title"),
+            str(story_finished)
+        ) and success
+        
+        # A well-formed id of a drawing that doesn't exist fails for good instead of retrying
+        _, missing_job = self.run_test("Submit Job For Missing Drawing", "POST", "jobs", 200, data={
+            "type": "drawing_analysis", "payload": {"drawing_id": "0" * 24}
+        })
+        _, missing = self.run_test("Wait For Failed Job", "GET", f"jobs/{missing_job.get('id')}?wait=20", 200)
+        success = self.check(
+            "Missing drawing fails without retries",
+            missing.get("status") == "failed" and missing.get("attempts") == 1 and missing.get("error"),
+            str(missing)
+        ) and success
+        
+        checks = [
+            self.run_test("Reject Malformed Drawing ID", "POST", "jobs", 400, data={
+                "type": "drawing_analysis", "payload": {"drawing_id": "not-an-id"}
+            })[0],
+            self.run_test("Reject Unknown Job Type", "POST", "jobs", 400, data={"type": "painting", "payload": {}})[0],
+            self.run_test("Reject Missing Payload Field", "POST", "jobs", 400, data={"type": "story_generation", "payload": {}})[0],
+            self.run_test("Get Unknown Job", "GET", f"jobs/{'0' * 24}", 404)[0]
+        ]
+        return success and all(checks), finished
+
+    def test_canvas_blob_caching(self):
+        """Test canvas payload downloads: ETag revalidation and byte ranges"""
+        if not self.token:
+            print("❌ Cannot test canvas downloads without token")
+            return False, {}
+        
+        svg = '<svg xmlns="http://www.w3.org/2000/svg" width="200" height="200">' + '<circle cx="100" cy="100" r="50"/>' * 40 + '</svg>'
+        success, drawing = self.run_test("Create Drawing With SVG", "POST", "drawings", 200, data={
+            "title": "Canvas download drawing", "canvas_data": {"svg": svg, "width": 200, "height": 200}
+        })
+        svg_url = (drawing.get("canvas_urls") or {}).get("svg", "")
+        success = self.check("Drawing lists a canvas URL for the SVG", svg_url.startswith("/api/")) and success
+        if not success:
+            return False, {}
+        endpoint = svg_url[len("/api/"):]
+        
+        full_ok, _ = self.run_test("Download SVG", "GET", endpoint, 200)
+        full = self.last_response
+        etag = full.headers.get("ETag", "")
+        success = self.check("Full download matches the saved SVG", full_ok and full.text == svg) and success
+        success = self.check("Download carries an ETag", bool(etag)) and success
+        
+        not_modified_ok, _ = self.run_test("Revalidate With ETag", "GET", endpoint, 304, headers={"If-None-Match": etag})
+        
+        range_ok, _ = self.run_test("Download Byte Range", "GET", endpoint, 206, headers={
+            "Range": "bytes=0-9", "Accept-Encoding": "identity"
+        })
+        partial = self.last_response
+        success = self.check(
+            "Range returns the requested bytes",
+            range_ok and partial.content == svg.encode()[:10]
+            and partial.headers.get("Content-Range") == f"bytes 0-9/{len(svg.encode())}"
+        ) and success
+        
+        unsatisfiable_ok, _ = self.run_test("Reject Unsatisfiable Range", "GET", endpoint, 416, headers={
+            "Range": f"bytes={len(svg.encode()) + 10}-"
+        })
+        stale_ok, _ = self.run_test("Ignore Range With Stale If-Range", "GET", endpoint, 200, headers={
+            "Range": "bytes=0-9", "If-Range": '"stale"'
+        })
+        missing_ok, _ = self.run_test("Get Unknown Canvas Field", "GET", endpoint.replace("/svg", "/audio"), 404)
+        return success and not_modified_ok and unsatisfiable_ok and stale_ok and missing_ok, drawing
+
+    def test_parent_overview(self):
+        """Test the parent overview across linked children"""
+        saved_token = self.token
+        suffix = uuid.uuid4().hex[:8]
+        
+        def sign_up(role, **fields):
+            email = f"{role}_{suffix}@example.com"
+            _, user = self.run_test(f"Register {role.title()}", "POST", "auth/register", 200, data={
+                "email": email, "username": f"{role}_{suffix}", "password": "Rainbow123!", **fields
+            })
+            _, login = self.run_test(f"Login {role.title()}", "POST", "auth/login", 200, data={
+                "email": email, "password": "Rainbow123!"
+            })
+            return user.get("id"), login.get("access_token")
+        
+        self.token = None
+        parent_id, parent_token = sign_up("parent", user_type="parent")
+        child_id, child_token = sign_up("child", user_type="child", age=7, parent_id=parent_id)
+        
+        # Some activity for the child: drawings, a story and a completed quest
+        self.token = child_token
+        for title in ["A whale in the ocean", "A rocket to the moon", "My dinosaur friend"]:
+            self.run_test("Create Child Drawing", "POST", "drawings", 200, data={"title": title, "canvas_data": {}})
+        self.run_test("Create Child Story", "POST", "stories", 200, data={
+            "title": "The whale", "content": "Once upon a time", "pages": [], "user_prompt": "a whale"
+        })
+        self.run_test("Complete Child Quest", "POST", "progress", 200, data={"quest_id": "quest_1", "status": "completed", "completion_percentage": 100})
+        self.run_test("Start Child Quest", "POST", "progress", 200, data={"quest_id": "quest_2", "completion_percentage": 20})
+        forbidden_ok, _ = self.run_test("Reject Overview For Child Account", "GET", "parent/overview", 403)
+        
+        self.token = parent_token
+        success, overview = self.run_test("Get Parent Overview", "GET", "parent/overview?recent=2", 200)
+        self.token = saved_token
+        
+        children = overview.get("children", [])
+        child = children[0] if children else {}
+        success = self.check("Overview lists the linked child", [c["id"] for c in children] == [child_id], str(children)) and success
+        success = self.check(
+            "Child counts and quest completion",
+            child.get("drawing_count") == 3 and child.get("story_count") == 1
+            and child.get("quests_started") == 2 and child.get("completed_quests") == 1,
+            str(child)
+        ) and success
+        recent = child.get("recent_drawings", [])
+        success = self.check(
+            "Recent drawings are the newest two, with thumbnail URLs",
+            [drawing["title"] for drawing in recent] == ["My dinosaur friend", "A rocket to the moon"]
+            and all(drawing.get("thumbnail_url") for drawing in recent),
+            str(recent)
+        ) and success
+        success = self.check("Top interests come from the child's drawings", bool(child.get("top_interests"))) and success
+        success = self.check(
+            "Totals add up across children",
+            overview.get("total_drawings") == 3 and overview.get("total_stories") == 1 and overview.get("total_completed_quests") == 1
+        ) and success
+        return success and forbidden_ok, overview
+
+    def test_interest_count_parity(self):
+        """Test that a rebuilt interest profile matches the one kept up to date on save"""
+        if not self.token:
+            print("❌ Cannot test interest counts without token")
+            return False, {}
+        
+        # A fresh user, so the profile holds exactly the drawings created here
+        saved_token = self.token
+        suffix = uuid.uuid4().hex[:8]
+        self.run_test("Register Interest Test User", "POST", "auth/register", 200, data={
+            "email": f"interests_{suffix}@example.com", "username": f"interests_{suffix}", "password": "Rainbow123!"
+        })
+        _, login = self.run_test("Login Interest Test User", "POST", "auth/login", 200, data={
+            "email": f"interests_{suffix}@example.com", "password": "Rainbow123!"
+        })
+        self.token = login.get("access_token")
+        
+        # Titles with Unicode whitespace (NBSP, em space, ideographic space) between the words
+        for title in ["Big\u00a0Whale\u2003in the ocean", "A rocket\u3000to the moon", "DINO\tfossil\u2028dig"]:
+            self.run_test("Create Interest Drawing", "POST", "drawings", 200, data={
+                "title": title, "description": "with my friend\u00a0the dragon", "canvas_data": {}
+            })
+        
+        _, incremental = self.run_test("Get Incremental Interests", "GET", "ai/interests", 200)
+        _, rebuilt = self.run_test("Rebuild Interests", "GET", "ai/interests?rebuild=true", 200)
+        self.token = saved_token
+        
+        success = self.check(
+            "Rebuilt interest scores match the incremental profile",
+            incremental.get("interests") and incremental.get("interests") == rebuilt.get("interests"),
+            f"{incremental.get('interests')} vs {rebuilt.get('interests')}"
+        )
+        return success, rebuilt
+
 def main():
     # Setup
     tester = DrawATaleAPITester()
@@ -338,6 +1023,11 @@ def main():
     if not get_drawings_success:
         print("❌ Getting drawings failed")
     
+    # Get lightweight summaries
+    get_summaries_success, _ = tester.test_get_drawing_summaries()
+    if not get_summaries_success:
+        print("❌ Getting drawing summaries failed")
+    
     # Get specific drawing
     if tester.drawing_id:
         get_drawing_success, _ = tester.test_get_drawing()
@@ -369,6 +1059,74 @@ def main():
         else:
             print("❌ Could not create drawing for deletion test")
 
+    print("\n===== TESTING CANVAS DOWNLOADS =====")
+    
+    canvas_success, _ = tester.test_canvas_blob_caching()
+    if not canvas_success:
+        print("❌ Canvas download test failed")
+    
+    thumbnails_success, _ = tester.test_signed_thumbnails()
+    if not thumbnails_success:
+        print("❌ Signed thumbnail test failed")
+    
+    print("\n===== TESTING AUTOSAVE =====")
+    
+    autosave_success, _ = tester.test_autosave()
+    if not autosave_success:
+        print("❌ Autosave test failed")
+    
+    print("\n===== TESTING BATCH UPLOADS =====")
+    
+    batch_success, _ = tester.test_batch_replay()
+    if not batch_success:
+        print("❌ Batch replay test failed")
+    
+    print("\n===== TESTING PAGINATION =====")
+    
+    pagination_success, _ = tester.test_keyset_pagination()
+    if not pagination_success:
+        print("❌ Keyset pagination test failed")
+    
+    print("\n===== TESTING STORY STREAMING =====")
+    
+    streaming_success, _ = tester.test_story_streaming()
+    if not streaming_success:
+        print("❌ Story streaming test failed")
+    
+    disconnect_success, _ = tester.test_story_stream_disconnect()
+    if not disconnect_success:
+        print("❌ Story stream disconnect test failed")
+    
+    failover_success, _ = tester.test_story_provider_failover()
+    if not failover_success:
+        print("❌ Story provider failover test failed")
+    
+    print("\n===== TESTING BACKGROUND JOBS =====")
+    
+    packing_success, _ = tester.test_time_lapse_packing()
+    if not packing_success:
+        print("❌ Time-lapse packing test failed")
+    
+    strokes_success, _ = tester.test_stroke_metrics()
+    if not strokes_success:
+        print("❌ Stroke metrics test failed")
+    
+    jobs_success, _ = tester.test_job_lifecycle()
+    if not jobs_success:
+        print("❌ Job lifecycle test failed")
+    
+    print("\n===== TESTING PARENT OVERVIEW =====")
+    
+    overview_success, _ = tester.test_parent_overview()
+    if not overview_success:
+        print("❌ Parent overview test failed")
+    
+    print("\n===== TESTING AI INSIGHTS =====")
+    
+    parity_success, _ = tester.test_interest_count_parity()
+    if not parity_success:
+        print("❌ Interest count parity test failed")
+
     # Print results
     print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
     print("\nBackend API testing complete.")
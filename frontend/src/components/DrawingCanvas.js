@@ -4,6 +4,9 @@ import paper from 'paper';
 import { drawingService } from '../services/drawingService';
 import { aiAssistance } from '../services/aiService';
 
+// Minimum gap between recorded pointer moves; mousemove can fire far more often
+const MOVE_SAMPLE_MS = 30;
+
 const DrawingCanvas = ({ user }) => {
   const canvasRef = useRef(null);
   const navigate = useNavigate();
@@ -15,6 +18,7 @@ const DrawingCanvas = ({ user }) => {
   const [drawingHistory, setDrawingHistory] = useState([]);
   const [currentStep, setCurrentStep] = useState(0);
   const [timeLapse, setTimeLapse] = useState([]);
+  const lastMoveRecordedAt = useRef(0);
   const [isLoading, setIsLoading] = useState(false);
   const [drawingTitle, setDrawingTitle] = useState('');
   const [rainbowHue, setRainbowHue] = useState(0);
@@ -107,7 +111,8 @@ const DrawingCanvas = ({ user }) => {
       point: { x: point.x, y: point.y }
     };
     const newTimeLapse = [...timeLapse, timeStep];
-    setTimeLapse(newTimeLapse);
+    setTimeLapse(prev => [...prev, timeStep]);
+    lastMoveRecordedAt.current = timeStep.timestamp;
     
     // AI monitoring
     if (aiInitialized) {
@@ -156,6 +161,14 @@ const DrawingCanvas = ({ user }) => {
     
     const point = new paper.Point(event.nativeEvent.offsetX, event.nativeEvent.offsetY);
     
+    // Record the pointer path for stroke length and speed analysis, at most every MOVE_SAMPLE_MS
+    const now = Date.now();
+    if (now - lastMoveRecordedAt.current >= MOVE_SAMPLE_MS) {
+      lastMoveRecordedAt.current = now;
+      const moveStep = { timestamp: now, action: 'move', point: { x: point.x, y: point.y } };
+      setTimeLapse(prev => [...prev, moveStep]);
+    }
+    
     if (tool === 'pencil' || tool === 'marker' || tool === 'rainbow') {
       if (window.currentPath) {
         window.currentPath.add(point);
@@ -204,7 +217,7 @@ const DrawingCanvas = ({ user }) => {
       state: newState
     };
     const newTimeLapse = [...timeLapse, timeStep];
-    setTimeLapse(newTimeLapse);
+    setTimeLapse(prev => [...prev, timeStep]);
     
     // AI monitoring
     if (aiInitialized) {
@@ -258,20 +271,22 @@ const DrawingCanvas = ({ user }) => {
   };
 
   const playTimeLapse = () => {
-    if (timeLapse.length === 0) return;
+    // Pointer moves carry no canvas state, so only the snapshots are played back
+    const snapshots = timeLapse.filter(step => step.state);
+    if (snapshots.length === 0) return;
     
     setIsPlaying(true);
     paper.project.clear();
     
     let stepIndex = 0;
     const interval = setInterval(() => {
-      if (stepIndex >= timeLapse.length) {
+      if (stepIndex >= snapshots.length) {
         clearInterval(interval);
         setIsPlaying(false);
         return;
       }
       
-      const step = timeLapse[stepIndex];
+      const step = snapshots[stepIndex];
       if (step.state) {
         paper.project.importJSON(step.state);
         paper.view.draw();
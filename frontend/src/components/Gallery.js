@@ -5,6 +5,8 @@ import LoadingSpinner from './LoadingSpinner';
 import DrawATaleLogo from './DrawATaleLogo';
 import paper from 'paper';
 
+const NO_IMAGE_THUMBNAIL = "data:image/svg+xml;charset=UTF-8,%3Csvg xmlns='http://www.w3.org/2000/svg' width='200' height='150' viewBox='0 0 200 150'%3E%3Crect width='200' height='150' fill='%23f0f0f0'/%3E%3Ctext x='100' y='75' text-anchor='middle' font-family='Arial' font-size='14' fill='%23666'%3ENo Image%3C/text%3E%3C/svg%3E";
+
 const Gallery = ({ user }) => {
   const [drawings, setDrawings] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -21,7 +23,7 @@ const Gallery = ({ user }) => {
 
   const fetchDrawings = async () => {
     try {
-      const userDrawings = await drawingService.getUserDrawings();
+      const userDrawings = await drawingService.getDrawingSummaries();
       setDrawings(userDrawings);
     } catch (error) {
       setError('Failed to load drawings');
@@ -42,101 +44,49 @@ const Gallery = ({ user }) => {
     });
   };
 
-  const generateThumbnail = (canvasData) => {
-    console.log('Raw canvas data:', canvasData);
-    
-    // Check if thumbnail exists and is valid base64
-    if (canvasData && canvasData.thumbnail) {
-      console.log('Thumbnail found:', canvasData.thumbnail.substring(0, 100) + '...');
-      // Make sure it has proper data URL format
-      if (canvasData.thumbnail.startsWith('data:')) {
-        return canvasData.thumbnail;
-      } else {
-        // It might be just base64 without the prefix
-        return `data:image/svg+xml;base64,${canvasData.thumbnail}`;
-      }
-    }
-    
-    // Try to use SVG data directly
-    if (canvasData && canvasData.svg) {
-      console.log('SVG data found:', canvasData.svg.substring(0, 100) + '...');
-      // Convert SVG string to base64
-      const base64Svg = btoa(canvasData.svg);
-      return `data:image/svg+xml;base64,${base64Svg}`;
-    }
-    
-    console.log('No image data found, using fallback');
-    // Simple fallback
-    return "data:image/svg+xml;charset=UTF-8,%3Csvg xmlns='http://www.w3.org/2000/svg' width='200' height='150' viewBox='0 0 200 150'%3E%3Crect width='200' height='150' fill='%23f0f0f0'/%3E%3Ctext x='100' y='75' text-anchor='middle' font-family='Arial' font-size='14' fill='%23666'%3ENo Image%3C/text%3E%3C/svg%3E";
-  };
+  // Small server-rendered variant, signed so the <img> needs no Authorization header
+  const thumbnailSrc = (drawing) => (
+    drawing.thumbnail_url ? `${process.env.REACT_APP_BACKEND_URL}${drawing.thumbnail_url}` : NO_IMAGE_THUMBNAIL
+  );
 
-  const renderThumbnail = (drawing) => {
-    // Try to decode and render SVG directly for better debugging
-    if (drawing.canvas_data && drawing.canvas_data.svg) {
-      console.log('Rendering SVG directly for:', drawing.title);
-      console.log('SVG content:', drawing.canvas_data.svg);
-      
-      // Parse the SVG to add proper attributes for scaling
-      let svgContent = drawing.canvas_data.svg;
-      
-      // Make sure SVG has proper viewBox and dimensions for scaling
-      if (!svgContent.includes('viewBox')) {
-        // Try to extract width/height and create viewBox
-        const widthMatch = svgContent.match(/width="(\d+)"/);
-        const heightMatch = svgContent.match(/height="(\d+)"/);
-        if (widthMatch && heightMatch) {
-          const width = widthMatch[1];
-          const height = heightMatch[1];
-          svgContent = svgContent.replace('<svg', `<svg viewBox="0 0 ${width} ${height}"`);
-        }
-      }
-      
-      // Ensure SVG scales to fit container
-      svgContent = svgContent.replace('<svg', '<svg width="100%" height="100%" preserveAspectRatio="xMidYMid meet"');
-      
-      return (
-        <div 
-          dangerouslySetInnerHTML={{ __html: svgContent }}
-          style={{ 
-            width: '100%', 
-            height: '100%', 
-            display: 'flex', 
-            alignItems: 'center', 
-            justifyContent: 'center' 
-          }}
-        />
-      );
+  const renderThumbnail = (drawing) => (
+    <img
+      src={thumbnailSrc(drawing)}
+      alt={drawing.title}
+      loading="lazy"
+      className="max-w-full max-h-full object-contain hover:scale-105 transition-transform duration-200"
+      style={{ 
+        minHeight: '120px', 
+        width: 'auto', 
+        height: 'auto',
+        maxWidth: '100%',
+        maxHeight: '100%',
+        display: 'block'
+      }}
+      onError={(e) => {
+        console.error('Thumbnail failed to load for:', drawing.title);
+        e.target.onerror = null;
+        e.target.src = NO_IMAGE_THUMBNAIL;
+      }}
+    />
+  );
+
+  // The listing only has summaries; canvas and time-lapse are loaded when a drawing is opened
+  const loadFullDrawing = async (drawing) => {
+    if (drawing.canvas_data) return drawing;
+    try {
+      return await drawingService.getDrawing(drawing.id);
+    } catch (error) {
+      console.error('Error loading drawing:', error);
+      setError('Failed to load drawing. Please try again.');
+      return null;
     }
-    
-    // Fallback to img tag
-    return (
-      <img
-        src={generateThumbnail(drawing.canvas_data)}
-        alt={drawing.title}
-        className="max-w-full max-h-full object-contain hover:scale-105 transition-transform duration-200"
-        style={{ 
-          minHeight: '120px', 
-          width: 'auto', 
-          height: 'auto',
-          maxWidth: '100%',
-          maxHeight: '100%',
-          display: 'block'
-        }}
-        onError={(e) => {
-          console.error('Image failed to load for:', drawing.title);
-          console.error('Attempted src:', e.target.src);
-          e.target.src = "data:image/svg+xml;charset=UTF-8,%3Csvg xmlns='http://www.w3.org/2000/svg' width='200' height='150' viewBox='0 0 200 150'%3E%3Crect width='200' height='150' fill='%23ff0000'/%3E%3Ctext x='100' y='75' text-anchor='middle' font-family='Arial' font-size='14' fill='white'%3EERROR%3C/text%3E%3C/svg%3E";
-        }}
-        onLoad={(e) => {
-          console.log('Image loaded successfully for:', drawing.title);
-          console.log('Image dimensions:', e.target.naturalWidth, 'x', e.target.naturalHeight);
-        }}
-      />
-    );
   };
 
-  const viewDrawing = (drawing) => {
-    setSelectedDrawing(drawing);
+  const viewDrawing = async (drawing) => {
+    const fullDrawing = await loadFullDrawing(drawing);
+    if (!fullDrawing) return;
+    setSelectedDrawing(fullDrawing);
     setViewMode('detail');
   };
 
@@ -167,8 +117,12 @@ const Gallery = ({ user }) => {
     setDeleteConfirmation(null);
   };
 
-  const playTimeLapse = async (drawing) => {
-    if (!drawing.time_lapse || drawing.time_lapse.length === 0) {
+  const playTimeLapse = async (summary) => {
+    const drawing = await loadFullDrawing(summary);
+    if (!drawing) return;
+    // Pointer moves carry no canvas state, so only the snapshots are played back
+    const snapshots = (drawing.time_lapse || []).filter(step => step.state);
+    if (snapshots.length === 0) {
       alert('No time-lapse data available for this drawing');
       return;
     }
@@ -190,14 +144,14 @@ const Gallery = ({ user }) => {
     // Play back the time-lapse
     let stepIndex = 0;
     const interval = setInterval(() => {
-      if (stepIndex >= drawing.time_lapse.length) {
+      if (stepIndex >= snapshots.length) {
         clearInterval(interval);
         setIsPlayingTimeLapse(false);
         alert('🎬 Time-lapse playback complete!');
         return;
       }
       
-      const step = drawing.time_lapse[stepIndex];
+      const step = snapshots[stepIndex];
       if (step.state) {
         scope.project.importJSON(step.state);
         scope.view.draw();
@@ -430,15 +384,13 @@ const Gallery = ({ user }) => {
                       >
                         View Details
                       </button>
-                      {drawing.time_lapse && drawing.time_lapse.length > 0 && (
-                        <button
-                          onClick={() => playTimeLapse(drawing)}
-                          disabled={isPlayingTimeLapse}
-                          className="btn-child btn-secondary text-sm px-3 py-1 w-full"
-                        >
-                          {isPlayingTimeLapse ? '🎬 Playing...' : '▶️ Play Time-lapse'}
-                        </button>
-                      )}
+                      <button
+                        onClick={() => playTimeLapse(drawing)}
+                        disabled={isPlayingTimeLapse}
+                        className="btn-child btn-secondary text-sm px-3 py-1 w-full"
+                      >
+                        {isPlayingTimeLapse ? '🎬 Playing...' : '▶️ Play Time-lapse'}
+                      </button>
                     </div>
                   </div>
                 </div>
@@ -454,8 +406,9 @@ const Gallery = ({ user }) => {
                   <div className="flex items-center space-x-6">
                     <div className="w-24 h-18 bg-gray-100 rounded-lg flex items-center justify-center overflow-hidden">
                       <img
-                        src={generateThumbnail(drawing.canvas_data)}
+                        src={thumbnailSrc(drawing)}
                         alt={drawing.title}
+                        loading="lazy"
                         className="max-w-full max-h-full object-contain"
                       />
                     </div>
@@ -465,16 +418,13 @@ const Gallery = ({ user }) => {
                       {drawing.description && (
                         <p className="text-sm text-gray-500 mt-1">{drawing.description}</p>
                       )}
-                      <div className="flex items-center space-x-2 mt-2">
-                        {drawing.quest_id && (
+                      {drawing.quest_id && (
+                        <div className="flex items-center space-x-2 mt-2">
                           <span className="text-xs bg-blue-100 text-blue-800 px-2 py-1 rounded-full">
                             🎯 Quest
                           </span>
-                        )}
-                        <span className="text-xs text-gray-500">
-                          {drawing.time_lapse ? drawing.time_lapse.length : 0} steps
-                        </span>
-                      </div>
+                        </div>
+                      )}
                     </div>
                     <div className="flex space-x-2">
                       <button
@@ -483,15 +433,13 @@ const Gallery = ({ user }) => {
                       >
                         View
                       </button>
-                      {drawing.time_lapse && drawing.time_lapse.length > 0 && (
-                        <button
-                          onClick={() => playTimeLapse(drawing)}
-                          disabled={isPlayingTimeLapse}
-                          className="btn-child btn-secondary text-sm px-4 py-2"
-                        >
-                          ▶️
-                        </button>
-                      )}
+                      <button
+                        onClick={() => playTimeLapse(drawing)}
+                        disabled={isPlayingTimeLapse}
+                        className="btn-child btn-secondary text-sm px-4 py-2"
+                      >
+                        ▶️
+                      </button>
                     </div>
                   </div>
                 </div>
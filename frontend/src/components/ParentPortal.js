@@ -1,12 +1,16 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { drawingService } from '../services/drawingService';
 import { questService } from '../services/questService';
 import { aiAssistance } from '../services/aiService';
 import LoadingSpinner from './LoadingSpinner';
 import DrawATaleLogo from './DrawATaleLogo';
 
+// Most recent drawings fetched per child (the overview endpoint allows up to 12)
+const RECENT_DRAWINGS_PER_CHILD = 12;
+
 const ParentPortal = ({ user }) => {
+  const [children, setChildren] = useState([]);
+  const [overviewTotals, setOverviewTotals] = useState({ total_drawings: 0, total_completed_quests: 0 });
   const [childDrawings, setChildDrawings] = useState([]);
   const [childProgress, setChildProgress] = useState([]);
   const [aiInsights, setAiInsights] = useState({});
@@ -27,13 +31,18 @@ const ParentPortal = ({ user }) => {
 
   const fetchChildData = async () => {
     try {
-      // In a real implementation, you would fetch data for child accounts
-      // linked to this parent account. For now, we'll use the current user's data
-      const [drawings, progress] = await Promise.all([
-        drawingService.getUserDrawings(),
+      // Counts, quest completion and recent drawings for every linked child in one request
+      const [overview, progress] = await Promise.all([
+        questService.getParentOverview(RECENT_DRAWINGS_PER_CHILD),
         questService.getUserProgress()
       ]);
       
+      const drawings = overview.children
+        .flatMap(child => child.recent_drawings.map(drawing => ({ ...drawing, childName: child.username })))
+        .sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+      
+      setChildren(overview.children);
+      setOverviewTotals(overview);
       setChildDrawings(drawings);
       setChildProgress(progress);
       
@@ -75,14 +84,14 @@ const ParentPortal = ({ user }) => {
   };
 
   const generateProgressReport = () => {
-    const completedQuests = childProgress.filter(p => p.status === 'completed').length;
+    const completedQuests = overviewTotals.total_completed_quests;
     const totalBadges = childProgress.reduce((acc, p) => acc + p.badges_earned.length, 0);
-    const totalDrawings = childDrawings.length;
+    const totalDrawings = overviewTotals.total_drawings;
     const averageProgress = childProgress.length > 0 
       ? Math.round(childProgress.reduce((acc, p) => acc + p.completion_percentage, 0) / childProgress.length)
       : 0;
     
-    // Calculate learning velocity (drawings per week)
+    // Calculate learning velocity (drawings per week) from each child's recent drawings
     const oneWeekAgo = new Date();
     oneWeekAgo.setDate(oneWeekAgo.getDate() - 7);
     const recentDrawings = childDrawings.filter(d => new Date(d.created_at) > oneWeekAgo).length;
@@ -166,7 +175,7 @@ Generated: ${new Date().toLocaleDateString()}
 ${aiReport}
 
 === RECENT ARTWORK ===
-${childDrawings.slice(0, 5).map(d => `• ${d.title} (${formatDate(d.created_at)})`).join('\n')}
+${childDrawings.slice(0, 5).map(d => `• ${d.title} by ${d.childName} (${formatDate(d.created_at)})`).join('\n')}
 
 Keep encouraging creativity and celebrate every masterpiece! 🎨
     `;
@@ -308,6 +317,33 @@ Keep encouraging creativity and celebrate every masterpiece! 🎨
                 </div>
               </div>
 
+              {/* Linked Children */}
+              <div className="card p-6">
+                <h3 className="text-xl font-bold mb-4">Your Children</h3>
+                {children.length === 0 ? (
+                  <p className="text-gray-600 text-center py-8">
+                    No child accounts are linked to this parent account yet.
+                  </p>
+                ) : (
+                  <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
+                    {children.map((child) => (
+                      <div key={child.id} className="p-4 bg-gray-50 rounded-lg">
+                        <div className="font-semibold">
+                          {child.username}{child.age ? `, age ${child.age}` : ''}
+                        </div>
+                        <div className="text-sm text-gray-600 mt-1">
+                          {child.drawing_count} drawings · {child.story_count} stories · {child.completed_quests} of {child.quests_started} quests completed
+                        </div>
+                        <div className="text-xs text-gray-500 mt-1 capitalize">
+                          Skill level: {child.skill_level}
+                          {child.top_interests.length > 0 && ` · Loves ${child.top_interests.join(', ')}`}
+                        </div>
+                      </div>
+                    ))}
+                  </div>
+                )}
+              </div>
+
               {/* Quick Actions */}
               <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
                 <button
@@ -352,7 +388,7 @@ Keep encouraging creativity and celebrate every masterpiece! 🎨
                         <div>
                           <div className="font-semibold">{drawing.title}</div>
                           <div className="text-sm text-gray-600">
-                            Created on {formatDate(drawing.created_at)}
+                            Created by {drawing.childName} on {formatDate(drawing.created_at)}
                           </div>
                           {drawing.quest_id && (
                             <div className="text-xs text-blue-600 mt-1">
@@ -455,13 +491,22 @@ Keep encouraging creativity and celebrate every masterpiece! 🎨
                 <div className="gallery-grid">
                   {childDrawings.map((drawing) => (
                     <div key={drawing.id} className="gallery-item">
-                      <div className="gallery-item-image bg-gray-100 flex items-center justify-center">
-                        <span className="text-4xl">🎨</span>
+                      <div className="gallery-item-image bg-gray-100 flex items-center justify-center overflow-hidden">
+                        {drawing.thumbnail_url ? (
+                          <img
+                            src={`${process.env.REACT_APP_BACKEND_URL}${drawing.thumbnail_url}`}
+                            alt={drawing.title}
+                            loading="lazy"
+                            className="max-w-full max-h-full object-contain"
+                          />
+                        ) : (
+                          <span className="text-4xl">🎨</span>
+                        )}
                       </div>
                       <div className="gallery-item-info">
                         <h4 className="gallery-item-title">{drawing.title}</h4>
                         <p className="gallery-item-date">
-                          {formatDate(drawing.created_at)}
+                          {drawing.childName} · {formatDate(drawing.created_at)}
                         </p>
                         {drawing.quest_id && (
                           <div className="text-xs bg-blue-100 text-blue-800 px-2 py-1 rounded-full mt-2">
@@ -469,21 +514,6 @@ Keep encouraging creativity and celebrate every masterpiece! 🎨
                           </div>
                         )}
                         <div className="mt-4 space-y-2">
-                          <button
-                            onClick={async () => {
-                              try {
-                                const analysis = await aiAssistance.analyzeDrawing(drawing.id);
-                                if (analysis) {
-                                  alert(`AI Analysis for "${drawing.title}":\n\n${JSON.stringify(analysis.analysis, null, 2)}`);
-                                }
-                              } catch (error) {
-                                console.error('Analysis failed:', error);
-                              }
-                            }}
-                            className="btn-child btn-primary text-sm px-3 py-1 w-full"
-                          >
-                            🤖 AI Analysis
-                          </button>
                           <button className="btn-child btn-secondary text-sm px-3 py-1 w-full">
                             📧 Email to Me
                           </button>
@@ -51,7 +51,9 @@ class AIAssistanceService {
     }, 1000); // Analyze after 1 second
   }
 
-  performPatternAnalysis(timeLapse, currentTool) {
+  performPatternAnalysis(recording, currentTool) {
+    // Pointer moves are sampled while drawing; the heuristics below count strokes and actions
+    const timeLapse = recording.filter(step => step.action !== 'move');
     const analysis = {
       suggestions: [],
       confidence: 0
@@ -189,7 +191,7 @@ class AIAssistanceService {
 
   calculateComplexity(timeLapse) {
     // Simple complexity based on number of actions and variety
-    const actionCount = timeLapse.length;
+    const actionCount = timeLapse.filter(step => step.action !== 'move').length;
     const toolCount = this.getUniqueTools(timeLapse).length;
     return Math.min((actionCount / 100) + (toolCount / 10), 1.0);
   }
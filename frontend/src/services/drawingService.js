@@ -21,6 +21,16 @@ export const drawingService = {
     }
   },
 
+  // Get lightweight drawing summaries for gallery listings
+  async getDrawingSummaries() {
+    try {
+      const response = await apiClient.get('/drawings/summary');
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || error.message;
+    }
+  },
+
   // Get specific drawing
   async getDrawing(drawingId) {
     try {
@@ -31,7 +41,7 @@ export const drawingService = {
     }
   },
 
-  // Update drawing
+  // Replace a drawing; fields left out are cleared (use autosaveDrawing for partial saves)
   async updateDrawing(drawingId, drawingData) {
     try {
       const response = await apiClient.put(`/drawings/${drawingId}`, drawingData);
@@ -41,6 +51,16 @@ export const drawingService = {
     }
   },
 
+  // Autosave changed fields and new time-lapse steps; version guards against overwriting newer saves
+  async autosaveDrawing(drawingId, changes) {
+    try {
+      const response = await apiClient.patch(`/drawings/${drawingId}`, changes);
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || error.message;
+    }
+  },
+
   // Delete drawing
   async deleteDrawing(drawingId) {
     try {
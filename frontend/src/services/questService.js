@@ -29,5 +29,15 @@ export const questService = {
     } catch (error) {
       throw error.response?.data || error.message;
     }
+  },
+
+  // Get counts, quest completion and recent drawings for all linked children (parent accounts)
+  async getParentOverview(recent = 4) {
+    try {
+      const response = await apiClient.get('/parent/overview', { params: { recent } });
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || error.message;
+    }
   }
 };
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""Micro-benchmark: compiled keyword matcher vs. the per-category str.count scoring it replaced.
+
+Usage: python scripts/bench_interest_analyzer.py [drawing_count]
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from ai_services import InterestAnalyzer
+
+
+def legacy_analyze(analyzer, drawings):
+    """Original implementation: one lowercase/split/count pass per category"""
+    texts = [f"{d.get('title', '')} {d.get('description', '')}" for d in drawings]
+    interests = {}
+    for category in analyzer.interest_categories:
+        total_matches = 0
+        total_words = 0
+        for text in texts:
+            text_lower = text.lower()
+            total_words += len(text_lower.split())
+            for keyword in analyzer.interest_keywords.get(category, []):
+                total_matches += text_lower.count(keyword)
+        interests[category] = min(total_matches / max(total_words, 1) * 100, 100.0)
+    return interests
+
+
+def make_drawings(count):
+    """Titles and descriptions shaped like the canvas page's, with some interest keywords"""
+    keywords = [kw for kws in InterestAnalyzer().interest_keywords.values() for kw in kws]
+    filler = ["my", "big", "happy", "picture", "of", "a", "the", "with", "blue", "red", "house", "sun", "family"]
+    random.seed(7)
+    drawings = []
+    for i in range(count):
+        title = " ".join(random.choices(filler, k=2) + random.choices(keywords, k=1)).title()
+        description = random.choice([
+            f"Drawing created by artist{i}",
+            f"Quest drawing: {random.choice(['The Quest for Lines', 'Shape Explorer', 'Color Master'])}",
+            f"Story illustration: The Amazing Adventure of {random.choice(keywords)}"
+        ])
+        drawings.append({"title": title, "description": description})
+    return drawings
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    analyzer = InterestAnalyzer()
+    drawings = make_drawings(count)
+
+    expected = legacy_analyze(analyzer, drawings)
+    actual = analyzer.analyze_drawing_patterns(drawings)
+    assert all(abs(expected[c] - actual[c]) < 1e-9 for c in expected), (expected, actual)
+
+    runs = 200
+    legacy = min(timeit.repeat(lambda: legacy_analyze(analyzer, drawings), number=runs, repeat=5)) / runs
+    compiled = min(timeit.repeat(lambda: analyzer.analyze_drawing_patterns(drawings), number=runs, repeat=5)) / runs
+    print(f"{count} drawings: legacy {legacy * 1e3:.3f} ms, compiled {compiled * 1e3:.3f} ms, speedup {legacy / compiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Delete canvas blobs no drawing references any more.
+
+Blobs are content-addressed and shared between drawings, so deleting or replacing a
+drawing leaves its blobs behind. This removes every blob whose digest no drawing's
+canvas_blobs refers to, plus leftover temporary files. Files younger than --min-age-hours
+are kept: a save writes its blobs before the drawing that references them.
+
+Usage: python scripts/gc_canvas_blobs.py [--dry-run] [--min-age-hours H]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from blob_store import DIGEST_PATTERN
+from server import blob_store, drawings_collection
+
+
+async def referenced_digests() -> set:
+    digests = set()
+    async for drawing in drawings_collection.find({"canvas_blobs": {"$exists": True}}, {"canvas_blobs": 1}):
+        for ref in (drawing.get("canvas_blobs") or {}).values():
+            if ref and ref.get("digest"):
+                digests.add(ref["digest"])
+    return digests
+
+
+async def collect(dry_run: bool, min_age_hours: float):
+    # Listed before the scan so a blob written during it is too young to be removed
+    cutoff = time.time() - min_age_hours * 3600
+    candidates = []
+    for directory, _, files in os.walk(blob_store.root):
+        for name in files:
+            path = os.path.join(directory, name)
+            if os.path.getmtime(path) < cutoff:
+                candidates.append((name, path))
+
+    referenced = await referenced_digests()
+    removed = kept = 0
+    freed = 0
+    for name, path in candidates:
+        is_blob = DIGEST_PATTERN.match(name)
+        if (is_blob and name in referenced) or not (is_blob or name.endswith(".tmp")):
+            kept += 1
+            continue
+        try:
+            stat = os.stat(path)
+            # Reused by a save since it was listed
+            if stat.st_mtime >= cutoff:
+                kept += 1
+                continue
+            if not dry_run:
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+        freed += stat.st_size
+
+    action = "Would remove" if dry_run else "Removed"
+    print(f"{action} {removed} unreferenced files ({freed / 1024:.1f} KiB); "
+          f"{kept} of {len(candidates)} old enough to check are still in use")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report what would be removed without deleting")
+    parser.add_argument("--min-age-hours", type=float, default=24.0, help="only remove files older than this")
+    args = parser.parse_args()
+    asyncio.run(collect(args.dry_run, args.min_age_hours))
+
+
+if __name__ == "__main__":
+    main()
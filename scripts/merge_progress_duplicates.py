@@ -0,0 +1,70 @@
+"""Merge progress documents recorded more than once for the same quest.
+
+Progress used to be inserted on every update, so older users can have many documents
+per (user_id, quest_id). The unique user_quest_unique index can't be built until those
+are merged: highest completion, all badges, completed if any of them was.
+
+Usage: python scripts/merge_progress_duplicates.py [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from server import progress_collection, refresh_progress_summary
+
+
+def merge(docs: list) -> dict:
+    docs = sorted(docs, key=lambda doc: doc["created_at"])
+    badges = []
+    for doc in docs:
+        badges.extend(badge for badge in doc.get("badges_earned", []) if badge not in badges)
+    completed = any(doc.get("status") == "completed" for doc in docs)
+    return {
+        "status": "completed" if completed else docs[-1].get("status", "in_progress"),
+        "completion_percentage": max(doc.get("completion_percentage", 0.0) for doc in docs),
+        "badges_earned": badges,
+        "created_at": docs[0]["created_at"],
+        "updated_at": max(doc.get("updated_at", doc["created_at"]) for doc in docs)
+    }
+
+
+async def merge_duplicates(dry_run: bool):
+    pipeline = [
+        {"$group": {"_id": {"user_id": "$user_id", "quest_id": "$quest_id"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+    groups = removed = 0
+    users = set()
+    async for group in progress_collection.aggregate(pipeline, allowDiskUse=True):
+        docs = await progress_collection.find({"_id": {"$in": group["ids"]}}).to_list(None)
+        keep, extra = docs[0]["_id"], [doc["_id"] for doc in docs[1:]]
+        groups += 1
+        removed += len(extra)
+        users.add(group["_id"]["user_id"])
+        if dry_run:
+            continue
+        await progress_collection.update_one({"_id": keep}, {"$set": merge(docs)})
+        await progress_collection.delete_many({"_id": {"$in": extra}})
+
+    if not dry_run:
+        for user_id in users:
+            await refresh_progress_summary(user_id)
+
+    action = "Would merge" if dry_run else "Merged"
+    print(f"{action} {groups} quests for {len(users)} users, removing {removed} duplicate documents")
+    if not dry_run and groups:
+        print("Restart the API (or create the index manually) to build user_quest_unique")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report duplicates without changing anything")
+    args = parser.parse_args()
+    asyncio.run(merge_duplicates(args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
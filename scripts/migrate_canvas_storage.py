@@ -0,0 +1,108 @@
+"""Move existing drawings to the current canvas storage format.
+
+Inline canvas data (drawings saved before the blob store) and uncompressed blobs are
+rewritten through the same path new drawings take, so paper.js JSON and SVG end up
+compressed in the blob store with only references left in MongoDB.
+
+Usage: python scripts/migrate_canvas_storage.py [--dry-run] [--limit N]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import zlib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from server import (
+    CANVAS_BLOB_FIELDS, CANVAS_COMPRESSION_LEVEL, CANVAS_FORMAT_VERSION, COMPRESSED_CANVAS_FIELDS,
+    drawings_collection, encode_canvas_blob, load_canvas_data, store_canvas_blobs
+)
+
+
+def estimated_bytes(canvas_data: dict) -> int:
+    """Size the heavy canvas fields would take once migrated, without writing blobs"""
+    total = 0
+    for field in CANVAS_BLOB_FIELDS:
+        if canvas_data.get(field) is None:
+            continue
+        data, _ = encode_canvas_blob(field, canvas_data[field])
+        if field in COMPRESSED_CANVAS_FIELDS:
+            data = zlib.compress(data, CANVAS_COMPRESSION_LEVEL)
+        total += len(data)
+    return total
+
+
+def stored_bytes(drawing: dict) -> int:
+    """Approximate on-disk size of a drawing's heavy canvas fields"""
+    total = 0
+    for field in CANVAS_BLOB_FIELDS:
+        ref = (drawing.get("canvas_blobs") or {}).get(field)
+        if ref:
+            total += ref.get("stored_size", ref["size"])
+        else:
+            value = (drawing.get("canvas_data") or {}).get(field)
+            if value is not None:
+                total += len(value.encode("utf-8")) if isinstance(value, str) else len(str(value))
+    return total
+
+
+async def migrate(dry_run: bool, limit: int):
+    query = {"$or": [
+        {"canvas_format": {"$exists": False}},
+        {"canvas_format": {"$lt": CANVAS_FORMAT_VERSION}}
+    ]}
+    cursor = drawings_collection.find(query, {"canvas_data": 1, "canvas_blobs": 1, "updated_at": 1})
+    if limit:
+        cursor = cursor.limit(limit)
+
+    migrated = skipped = failed = 0
+    before = after = 0
+    async for drawing in cursor:
+        try:
+            canvas_data = await load_canvas_data(drawing.get("canvas_data"), drawing.get("canvas_blobs") or {})
+            missing = [field for field in (drawing.get("canvas_blobs") or {}) if field not in canvas_data]
+            if missing:
+                print(f"Skipping {drawing['_id']}: blobs missing for {', '.join(missing)}")
+                skipped += 1
+                continue
+
+            before += stored_bytes(drawing)
+            if dry_run:
+                after += estimated_bytes(canvas_data)
+                migrated += 1
+                continue
+
+            inline, refs = await store_canvas_blobs(canvas_data)
+            migrated_doc = {"canvas_data": inline, "canvas_blobs": refs}
+            after += stored_bytes(migrated_doc)
+
+            # updated_at is left alone, and a drawing saved meanwhile is skipped rather than overwritten
+            result = await drawings_collection.update_one(
+                {"_id": drawing["_id"], "updated_at": drawing["updated_at"]},
+                {"$set": {**migrated_doc, "canvas_format": CANVAS_FORMAT_VERSION}}
+            )
+            if result.modified_count:
+                migrated += 1
+            else:
+                skipped += 1
+        except Exception as e:
+            print(f"Migration error for drawing {drawing['_id']}: {e}")
+            failed += 1
+
+    action = "Would migrate" if dry_run else "Migrated"
+    print(f"{action} {migrated} drawings ({skipped} skipped, {failed} failed)")
+    if after:
+        print(f"Canvas storage: {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB ({before / after:.1f}x smaller)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without updating drawings")
+    parser.add_argument("--limit", type=int, default=0, help="migrate at most this many drawings")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.dry_run, args.limit))
+
+
+if __name__ == "__main__":
+    main()